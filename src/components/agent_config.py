@@ -229,7 +229,8 @@ def render():
             st.write("") # Spacer to align button
             with st.container(key=f"agent_cfg_{config['id']}_load_bttn"):
                 if st.button("Load", key=f"load_cfg_{config['id']}", use_container_width=True):
-                    loaded_data = config['config']
+                    # Fresh parse of just this config, so session state never shares the listed dicts
+                    loaded_data = db_logic.get_agent_config(db, config['id']) or {}
                     
                     # Load into session state
                     if "model_params" in loaded_data:
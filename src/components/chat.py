@@ -3,9 +3,13 @@ import streamlit.components.v1 as components
 from uuid import uuid4
 from typing import Dict, Any, Optional
 import json
+import time
 import src.core.db as db_logic
 from agno.agent import Agent
 
+# Minimum seconds between redraws of the streaming reply
+STREAM_RENDER_INTERVAL = 0.05
+
 def scroll_to_anchor():
     """
     Injects JS to scroll specifically to the 'current_response_anchor' element.
@@ -287,6 +291,7 @@ def render(agent: Agent, history_db):
 
             # --- STREAMING ---
             full_response = ""
+            events = []
             try:
                 if not agent:
                     full_response = "⚠️ Agent not initialized. Please configure the model in the 'Agent' > 'Agent Configuration' section."
@@ -301,6 +306,7 @@ def render(agent: Agent, history_db):
                             add_dependencies_to_context = True,
                             knowledge_filters=st.session_state.get("knowledge_filters", None)
                         )
+                    last_render = 0.0
                     for chunk in stream:
                         if hasattr(chunk, 'references') and chunk.references and chunk.event != 'RunCompleted':
                             chunk.references = ''
@@ -310,24 +316,46 @@ def render(agent: Agent, history_db):
                         str_event = json.dumps(event)
                         
                         # Store RAW JSON string for the renderer (this is the key change)
-                        full_response += str_event + "\n"
-                        st.session_state["current_chat"][-1]["assistant"] = full_response
-                        
-                        # Re-render the container using the new logic
-                        render_current_chat_container(current_chat_placeholder)
+                        events.append(str_event + "\n")
+
+                        # Re-render the container using the new logic. Each redraw re-parses the whole
+                        # response, so token events are throttled; tool events always show at once.
+                        now = time.monotonic()
+                        if chunk.event != "RunContent" or now - last_render >= STREAM_RENDER_INTERVAL:
+                            full_response = "".join(events)
+                            st.session_state["current_chat"][-1]["assistant"] = full_response
+                            render_current_chat_container(current_chat_placeholder)
+                            last_render = now
+
+                    # Final redraw with every event
+                    full_response = "".join(events)
+                    st.session_state["current_chat"][-1]["assistant"] = full_response
+                    render_current_chat_container(current_chat_placeholder)
 
             except Exception as e:
                  # If error, append it as a fake content event or just text
                  error_event = json.dumps({"event": "RunContent", "content": f"\n\nError: {str(e)}"})
-                 full_response += error_event + "\n"
+                 if events:
+                     events.append(error_event + "\n")
+                     full_response = "".join(events)
+                 else:
+                     full_response += error_event + "\n"
                  st.session_state["current_chat"][-1]["assistant"] = full_response
                  render_current_chat_container(current_chat_placeholder)
             finally:
+                # A rerun can interrupt the stream between throttled redraws; save every event received
+                if events:
+                    full_response = "".join(events)
                 st.session_state.running = None
-                db_logic.save_exchange_to_db(
+                exchange_id = db_logic.save_exchange_to_db(
                     history_db, st.session_state["session_id"], original_query, full_response
                 )
-                st.session_state.history = db_logic.load_history_from_db(
-                    history_db, st.session_state.get("session_id")
-                )
+                if exchange_id is not None and st.session_state.get("history"):
+                    # The pending turn is already the last history entry; fill it in
+                    # instead of re-reading the whole session back from SQLite
+                    st.session_state.history[-1].update({"id": exchange_id, "assistant": full_response})
+                else:
+                    st.session_state.history = db_logic.load_history_from_db(
+                        history_db, st.session_state.get("session_id")
+                    )
                 st.rerun()
\ No newline at end of file
@@ -1,5 +1,6 @@
 import streamlit as st
 import os
+import src.core.knowledge as kb_logic
 
 def get_env_defaults():
     """Reads environment variables for DB config."""
@@ -13,12 +14,14 @@ def get_env_defaults():
         "max_results": 20,
         "knowledge_name": "Default Knowledge Base",
         "reranker_type": "None",
-        "reranker_model": "qwen3:latest",
+        "reranker_model": "qwen3:0.6b",
         "top_n": 5,
         "score_threshold": 0.8,
         "collected_number": 10,
         "reasoning": False,
         "few_shot": False,
+        "max_workers": 1,
+        "rerank_endpoint": os.getenv("RERANK_ENDPOINT", "http://localhost:8001/rerank"),
     }
 
 def auto_initialize():
@@ -29,6 +32,7 @@ def auto_initialize():
     if "kb_confirmed_config" not in st.session_state:
         defaults = get_env_defaults()
         st.session_state['kb_confirmed_config'] = defaults
+        st.session_state['kb_config_key'] = kb_logic.config_key(defaults)
         # Assume if we have defaults, we want to try using them
         st.session_state['kb_active_type'] = "PostgreSQL + PGVector"
 
@@ -61,14 +65,18 @@ def render():
         kb_name = st.text_input("Knowledge name", value=current_config.get("knowledge_name"))
         kb_max_results = st.number_input("Max Results", value=current_config.get("max_results"))
 
+        reranker_types = ("None", "Heuristic", "Cross-encoder")
         selected_reranker_type = st.selectbox(
             "Reranker type",
-            ("None", "Heuristic"),
-            index=0 if current_config.get('reranker_type') == "None" else 1
+            reranker_types,
+            index=reranker_types.index(current_config.get('reranker_type', "None"))
         )
 
-        if selected_reranker_type == "Heuristic":
+        if selected_reranker_type != "None":
             rk_model = st.text_input("Reranker model", value=current_config.get("reranker_model"))
+            rk_endpoint = current_config.get("rerank_endpoint", get_env_defaults()["rerank_endpoint"])
+            if selected_reranker_type == "Cross-encoder":
+                rk_endpoint = st.text_input("Rerank endpoint (TEI / llama.cpp)", value=rk_endpoint)
             topn, scorethrses, collnum = st.columns(3)
             with topn:
                 rk_topn = st.number_input("Top n output", value=current_config.get("top_n"), min_value=1)
@@ -76,11 +84,13 @@ def render():
                 rk_score_thres = st.number_input("Score threshold", value=current_config.get("score_threshold"), min_value=0.0, max_value=1.0, step=0.01)
             with collnum:
                 rk_collect_num = st.number_input("Maximum collected docs", value=current_config.get("collected_number"), min_value=1)
-            reasoncol, fewshotcol = st.columns(2)
+            reasoncol, fewshotcol, workerscol = st.columns(3)
             with reasoncol:
                 rk_reason = st.checkbox("Reasoning while rerank?", value=current_config.get("reasoning"))
             with fewshotcol:
                 rk_fewshot = st.checkbox("Add few shot?", value=current_config.get("few_shot"))
+            with workerscol:
+                rk_workers = st.number_input("Parallel scoring requests", value=current_config.get("max_workers", 1), min_value=1, max_value=32)
 
         if st.button("Save & Reconnect", type="primary"):
             st.session_state['kb_confirmed_config'] = {
@@ -94,12 +104,14 @@ def render():
                     "reranker_type": selected_reranker_type,
                     "reranker_model": rk_model,
                     "top_n": rk_topn, "score_threshold": rk_score_thres, "collected_number": rk_collect_num, 
-                    "reasoning": rk_reason, "few_shot": rk_fewshot,
+                    "reasoning": rk_reason, "few_shot": rk_fewshot, "max_workers": rk_workers,
+                    "rerank_endpoint": rk_endpoint,
                 })
             else:
                 st.session_state["kb_confirmed_config"].update({
                     "reranker_type": selected_reranker_type,
                 })
+            st.session_state['kb_config_key'] = kb_logic.config_key(st.session_state['kb_confirmed_config'])
             st.session_state['kb_active_type'] = selected_kb_type
             st.success("Configuration updated!")
             
@@ -1,22 +1,33 @@
 import streamlit as st
 import pathlib
+import datetime
+import math
+import functools
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import src.core.knowledge as kb_logic
 import src.core.db as db_logic
-from agno.filters import AND, EQ, IN, NOT
 from uuid import uuid4
 import json
-import pandas as pd
-from sqlalchemy import text
-from agno.knowledge import Knowledge
-
-@st.cache_data 
-def get_cached_contents(_knowledge, kb_config): 
-    try:
-        return _knowledge.contents_db.get_knowledge_contents()
-    except Exception as e:
-        return [], str(e)
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from agno.knowledge import Knowledge
+
+# Number of URLs handed to knowledge.add_contents per call
+URL_BATCH_SIZE = 50
+# Rows of the stored-knowledge table sent to the browser at once
+TABLE_PAGE_SIZE = 50
+
+# cache_resource hands back the cached rows as-is, instead of unpickling a fresh copy of
+# every row on each rerun like cache_data does. Callers must treat the rows as read-only.
+@st.cache_resource(ttl=60, show_spinner=False)
+def get_cached_contents(_knowledge, kb_config_key, sort_key="Newest first", marked_metaids=(), ids=None): 
+    # Errors propagate so that a failed query is not cached as an empty table
+    return kb_logic.query_knowledge_contents(_knowledge, ids=ids, marked_metaids=marked_metaids, sort_key=sort_key)
     
-# Functions to filter contents based on metadata, name or status    
+# Python-side filters on already loaded contents (fallback when the SQL filter can't run)    
 def filter_contents_by_metadata(contents, key, value, relation):
     if not key or not value:
         return contents
@@ -38,33 +49,27 @@ def filter_contents_by_name(contents, search_str, relation):
     if not search_str:
         return contents
 
-    filtered = []
-    # Normalize search string
+    # Normalize search string and parse it once: split by ' OR ' first, then each group by ' AND '
     search_lower = search_str.lower().strip()
+    and_groups = [
+        [t.strip() for t in group.split(' and ') if t.strip()]
+        for group in search_lower.split(' or ')
+    ]
 
-    for c in contents:
-        name_lower = c.name.lower()
-        matches_criteria = False
-
-        # Step 1: Split by ' OR ' first.
-        or_groups = search_lower.split(' or ')
+    if relation not in ('in', 'not in'):
+        return []
+    keep_matches = relation == 'in'
 
-        for group in or_groups:
-            # Step 2: Split each group by ' AND '.
-            and_terms = [t.strip() for t in group.split(' and ') if t.strip()]
-            
-            # Check if ALL terms in this group are in the name
-            if all(term in name_lower for term in and_terms):
-                matches_criteria = True
-                break 
+    # Lowercase every name once, then match each against the parsed groups
+    names_lc = [c.name.lower() for c in contents]
 
+    filtered = []
+    for c, name_lower in zip(contents, names_lc):
+        # A name matches if ALL terms of ANY group are in it
+        matches_criteria = any(all(term in name_lower for term in and_terms) for and_terms in and_groups)
         # Apply relation (Keep if 'in', Exclude if 'not in')
-        if relation == 'in':
-            if matches_criteria:
-                filtered.append(c)
-        elif relation == 'not in':
-            if not matches_criteria:
-                filtered.append(c)
+        if matches_criteria == keep_matches:
+            filtered.append(c)
 
     return filtered
 
@@ -72,16 +77,12 @@ def filter_contents_by_status(contents, status_str, relation):
     if not status_str:
         return contents
 
-    filtered = []
-    for c in contents:
-        status = c.status
-        if relation == 'is':
-            if status_str.lower() == status.lower():
-                filtered.append(c)
-        elif relation == 'is not':
-            if status_str.lower() != status.lower():
-                filtered.append(c)
-    return filtered
+    status_lc = status_str.lower()
+    if relation == 'is':
+        return [c for c in contents if c.status.lower() == status_lc]
+    elif relation == 'is not':
+        return [c for c in contents if c.status.lower() != status_lc]
+    return []
 
 def filter_contents(contents, type, **kwargs):
     if type == "metadata":
@@ -112,20 +113,57 @@ def auto_initialize(history_db):
     session_id = st.session_state.get("session_id")
     if session_id and history_db:
         try:
-            marked_ids = db_logic.get_session_documents(history_db, session_id)
-            if marked_ids:
-                st.session_state["knowledge_filters"] = [IN("metaid", marked_ids)]
-            else:
-                st.session_state["knowledge_filters"] = None
+            set_knowledge_filters(db_logic.get_session_documents(history_db, session_id))
         except Exception:
             # On error (e.g. DB not ready), default to None
-            st.session_state["knowledge_filters"] = None
+            set_knowledge_filters(None)
+    else:
+        set_knowledge_filters(None)
+
+def set_knowledge_filters(marked_ids):
+    """
+    Points knowledge_filters at the marked documents, rebuilding the IN filter only when
+    the marked set actually changed so downstream searches see a stable object.
+    """
+    cur = hash(frozenset(marked_ids or ()))
+    if st.session_state.get("_knowledge_filters_marked_hash") == cur and "knowledge_filters" in st.session_state:
+        return
+    if marked_ids:
+        from agno.filters import IN
+        st.session_state["knowledge_filters"] = [IN("metaid", list(marked_ids))]
     else:
         st.session_state["knowledge_filters"] = None
+    st.session_state["_knowledge_filters_marked_hash"] = cur
 
-def time_convert(timestamp):
-    import datetime
-    return datetime.datetime.fromtimestamp(int(timestamp), datetime.UTC)
+def time_convert(timestamp, fmt=None):
+    dt = datetime.datetime.fromtimestamp(int(timestamp), datetime.UTC)
+    return dt.strftime(fmt) if fmt else dt
+
+@functools.lru_cache(maxsize=4096)
+def format_updated_at(timestamp):
+    """Table label for an updated_at epoch; memoized so reruns don't re-format unchanged rows."""
+    return time_convert(timestamp, "%Y-%m-%d %H:%M GMT")
+
+def build_table_rows(contents_page, marked_ids, mark_all, delete_all):
+    """
+    Rows for the stored-knowledge editor (one page, so rebuilding them every run is cheap).
+    """
+    # Logic: Priority to Button State > DB State. These are constant for the whole table,
+    # so resolve them once instead of per row.
+    delete_default = bool(delete_all)  # Default to unchecked
+    return [
+        {
+            "Mark": mark_all if mark_all is not None else c.id in marked_ids,
+            "Delete": delete_default,
+            "Name": c.name,
+            "Updated At": format_updated_at(c.updated_at),
+            "Status": c.status,
+            "Edit": False,    # Default to unchecked
+            "ID": c.id,          # Hidden ID column
+            "MetaID": c.metadata.get("metaid"),  # Hidden MetaID column
+        }
+        for c in contents_page
+    ]
 
 # Function to edit content of Embedded Documents
 @st.dialog("Edit Content")
@@ -135,7 +173,7 @@ def edit_content_dialog(
     current_description: str,
     current_metadata: dict,
     current_updated_at: str,
-    knowledge: Knowledge
+    knowledge: "Knowledge"
 ):
     """
     Dialog to edit content name, description, and metadata.
@@ -169,155 +207,103 @@ def edit_content_dialog(
 
     # 4. Save Action
     if st.button(label="Save", type="primary"):
-        new_metadata = json.loads(metadata_str)
-        new_metadata['metaid'] = metaid
-        from agno.knowledge.content import Content
-        saved_content = Content(id=content_id, name=new_name, description=new_description, metadata=new_metadata)
-        # Update content in contentdb
-        knowledge._update_content(saved_content)
-        get_cached_contents.clear()
-        kb_logic.setup_knowledge_base.clear()
+        # Validate before touching the DB; keep the dialog open so edits aren't lost
+        try:
+            new_metadata = json.loads(metadata_str)
+        except json.JSONDecodeError as e:
+            st.error(f"Invalid JSON at line {e.lineno}: {e.msg}")
+            return
+        if not isinstance(new_metadata, dict):
+            st.error("Metadata must be a JSON object, for example: {\"type\": \"pdf\"}")
+            return
+
+        # Only send the fields that actually changed
+        changes = {}
+        if new_name != current_name:
+            changes["name"] = new_name
+        if new_description != current_description:
+            changes["description"] = new_description
+        metadata_patch = {
+            k: v for k, v in new_metadata.items()
+            if k != "metaid" and (k not in editable_metadata or editable_metadata[k] != v)
+        }
+        if metadata_patch:
+            changes["metadata_patch"] = metadata_patch
+        removed_keys = [k for k in editable_metadata if k not in new_metadata]
+        if removed_keys:
+            changes["removed_keys"] = removed_keys
+
+        if changes:
+            kb_logic.update_content_fields(knowledge, content_id, **changes)
+            get_cached_contents.clear()
+            kb_logic.setup_knowledge_base.clear()
         st.rerun()
     
 
-def render(history_db=None):
-    st.header("📚 Knowledge File Management")
-
-    if history_db is None:
-        history_db = db_logic.get_db()
-
-    # Verify connection first
-    if st.session_state.get('kb_active_type') != "PostgreSQL + PGVector" or not st.session_state.get('kb_confirmed_config'):
-        st.error("Please configure the PostgreSQL connection in 'Connect Database' first.")
-        return
-
-    # Initialize KB Connection
-    try:
-        knowledge = kb_logic.setup_knowledge_base(st.session_state['kb_confirmed_config'])
-    except Exception as e:
-        st.error(f"Could not connect to Knowledge Base: {e}")
-        return
-
-    col_add_url, col_add_file = st.columns(2)
-
-    # --- Add URLs ---
-    with col_add_url:
-        st.subheader("🌐 Add URLs")
-        urls_input = st.text_area("Enter URLs (one per line)", height=100)
-        if st.button("Add URLs"):
-            url_contents = []
-            if urls_input:
-                urls = [url.strip() for url in urls_input.split('\n') if url.strip()]
-                if urls:
-                    with st.spinner("Processing URLs..."):
-                        try:
-                            for url in urls:
-                                metaid = str(uuid4())
-                                url_contents.append({
-                                    "url": url,
-                                    "name": url,
-                                    "metadata": {"metaid": metaid},
-                                })
-                            knowledge.add_contents(url_contents)
-                            st.success(f"Added {len(urls)} URLs successfully!")
-                        except Exception as e:
-                            st.error(f"Error adding URLs: {e}")
-                    get_cached_contents.clear()
-                    kb_logic.setup_knowledge_base.clear()
-            else:
-                st.warning("Please enter at least one URL.")
-
-    # --- Add Files ---
-    with col_add_file:
-        if "file_uploader_key" not in st.session_state:
-            st.session_state["file_uploader_key"] = 0
-        st.subheader("📄 Add Files")
-        uploaded_files = st.file_uploader(
-            "Upload PDFs/Text", 
-            accept_multiple_files=True, 
-            key=f"uploader_{st.session_state['file_uploader_key']}"
-        )
-        
-        if st.button("Add File(s)", type="primary"):
-            if uploaded_files:
-                with st.spinner("📥 Loading documents..."):
-                    contents_to_add = []
-                    temp_paths = []
-                    pathlib.Path("tmp").mkdir(parents=True, exist_ok=True)
-
-                    for file in uploaded_files:
-                        temp_path = pathlib.Path("tmp") / file.name
-                        with open(temp_path, "wb") as f:
-                            f.write(file.getbuffer())
-                        metaid = str(uuid4())
-                        contents_to_add.append({
-                            "path": str(temp_path),
-                            "name": file.name,
-                            "metadata": {"metaid": metaid},
-                        })
-                        temp_paths.append(temp_path)
-
-                    try:
-                        if contents_to_add:
-                            knowledge.add_contents(contents_to_add)
-                            st.success(f"✅ Added {len(contents_to_add)} file(s)")
-                        
-                        for path in temp_paths:
-                            if path.exists(): path.unlink()
-                                
-                    except Exception as e:
-                        st.error(f"Error adding files: {e}")
-                    
-                    st.session_state["file_uploader_key"] += 1
-                    get_cached_contents.clear()
-                    kb_logic.setup_knowledge_base.clear()
-                    st.rerun()
-
-    st.divider()
-    st.subheader("🗄️ Stored Knowledge")
-
-    # --- Fetch Content List ---      
-    raw_contents, _ = get_cached_contents(knowledge, st.session_state['kb_confirmed_config'])
+@st.fragment
+def _table_block(knowledge, history_db, current_session_id):
+    """
+    Stored-knowledge table and its action buttons.
+    Runs as a fragment so checkbox toggles only rerun this block, not the whole page.
+    """
+    sort_key = st.selectbox("Sort by", options=list(kb_logic.CONTENT_SORT_OPTIONS), key="kb_sort_key")
 
     # --- Fetch Marked Docs for Session ---
-    current_session_id = st.session_state.get("session_id")
     marked_metaids = []
     if current_session_id:
         marked_metaids = db_logic.get_session_documents(history_db, current_session_id)
+    # Hashed set built once; reused for the cache key and the Mark merge below
+    marked_metaids_set = frozenset(marked_metaids or ())
 
     # --- Initial Fitler Setup ---
     if "filtered_ids" not in st.session_state:
         st.session_state.filtered_ids = None
-    if st.session_state.filtered_ids is None:
-        contents = raw_contents
-    else:
-        valid_ids = set(st.session_state.filtered_ids)
-        contents = [c for c in raw_contents if c.id in valid_ids]
+    filtered_ids = st.session_state.filtered_ids
+
+    # --- Fetch Content List (filtered, sorted and flagged as marked by the DB) ---      
+    try:
+        contents, marked_content_ids = get_cached_contents(
+            knowledge,
+            st.session_state['kb_config_key'],
+            sort_key,
+            tuple(sorted(marked_metaids_set)),
+            tuple(filtered_ids) if filtered_ids is not None else None,
+        )
+    except Exception as e:
+        # No table (and no Mark/Delete actions) rather than an empty one that looks real
+        st.error(f"Error loading knowledge contents: {e}")
+        return
 
     # --- Update Knowledge Filters based on Marked Docs ---
-    if marked_metaids:
-        st.session_state["knowledge_filters"] = [IN("metaid", marked_metaids)]
-    else:
-        st.session_state["knowledge_filters"] = None
+    set_knowledge_filters(marked_metaids_set)
 
     # --- Mapping ---
-    content_map = {c.id: c for c in contents}
+    # Reuse the id -> content map while get_cached_contents hands back the very same list; any
+    # cache clear, sort, filter or mark change yields a new list object, so the map can't go stale
+    if st.session_state.get("_cmap_contents") is contents:
+        content_map = st.session_state["_cmap"]
+    else:
+        content_map = {c.id: c for c in contents}
+        st.session_state["_cmap"] = content_map
+        st.session_state["_cmap_contents"] = contents
 
     # select/unselect all functionality
-    if "kb_table_version" not in st.session_state:
-        st.session_state.kb_table_version = 0
     if "mark_all_state" not in st.session_state:
         st.session_state.mark_all_state = None  # None = use DB, True = all yes, False = all no
     if "delete_all_state" not in st.session_state:
         st.session_state.delete_all_state = None
 
+    if "kb_table_reset" not in st.session_state:
+        st.session_state.kb_table_reset = 0
+
     def set_table_state(mark=None, delete=None):
-        """Updates the default state for columns and forces table refresh"""
+        """Updates the default state for columns (part of the editor key, so the table refreshes)"""
+        # Explicit reset: also drop manual edits when the state itself doesn't change (select all twice)
+        st.session_state.kb_table_reset += 1
         if mark is not None:
             st.session_state.mark_all_state = mark
         if delete is not None:
             st.session_state.delete_all_state = delete
-        st.session_state.kb_table_version += 1
     # We use small columns to place these buttons neatly above the table
     c_all_1, c_all_2, c_all_3, c_all_4, c_type, c_key, c_rela, c_value, c_search = st.columns([0.4, 1.1, 0.4, 1.1, 1, 1, 1, 2.5, 0.5])
     
@@ -341,7 +327,6 @@ def render(history_db=None):
             # Reset selection states when filter changes to prevent accidental mass selection
             st.session_state.mark_all_state = None
             st.session_state.delete_all_state = None
-            st.session_state.kb_table_version += 1
             st.rerun()
     # SEARCH: Only show if a type is selected
     else:
@@ -373,61 +358,57 @@ def render(history_db=None):
         with c_search:
             # The Search Button
             if st.button("🔍"):
-                # DRILL DOWN: Filter the CURRENTLY displayed_contents
-                new_subset = filter_contents(
-                    contents, 
-                    filter_type, 
-                    key=filter_key, 
-                    value=filter_value, 
-                    search_str=filter_value, 
-                    status_str=filter_value,
-                    relation=filter_relation
-                )
+                # DRILL DOWN: Filter the CURRENTLY displayed_contents, in SQL
+                try:
+                    new_subset, _ = kb_logic.query_knowledge_contents(
+                        knowledge,
+                        ids=filtered_ids,
+                        name=filter_value if filter_type == "name" else None,
+                        status=filter_value if filter_type == "status" else None,
+                        meta_key=filter_key,
+                        meta_value=filter_value if filter_type == "metadata" else None,
+                        relation=filter_relation,
+                    )
+                except Exception:
+                    new_subset = filter_contents(
+                        contents, 
+                        filter_type, 
+                        key=filter_key, 
+                        value=filter_value, 
+                        search_str=filter_value, 
+                        status_str=filter_value,
+                        relation=filter_relation
+                    )
                 
                 # Update the ID list with the new narrower results
                 st.session_state.filtered_ids = [c.id for c in new_subset]
                 # Reset selection states when filter changes
                 st.session_state.mark_all_state = None
                 st.session_state.delete_all_state = None
-                st.session_state.kb_table_version += 1
                 st.rerun()
 
-    # Build the DataFrame rows
-    table_data = []
-    for c in contents:
-        # Determine if marked
-        c_metaid = c.metadata.get("metaid")
-        
-        # Logic: Priority to Button State > DB State
-        if st.session_state.mark_all_state is not None:
-            is_marked = st.session_state.mark_all_state
-        else:
-            is_marked = (c_metaid in marked_metaids) if c_metaid else False
-
-        if st.session_state.delete_all_state is not None:
-            is_deleted = st.session_state.delete_all_state
-        else:
-            is_deleted = False
-        
-        table_data.append({
-            "Mark": is_marked,
-            "Delete": is_deleted,  # Default to unchecked
-            "Name": c.name,
-            "Updated At": str(time_convert(str(c.updated_at)))[:-9] + " GMT",
-            "Status": c.status,
-            "Edit": False,    # Default to unchecked
-            "ID": c.id,          # Hidden ID column
-            "MetaID": c_metaid,  # Hidden MetaID column
-        })
-
-    df = pd.DataFrame(table_data)
+    # --- Pagination: only one page of rows is built and sent to the editor ---
+    n_pages = max(1, math.ceil(len(contents) / TABLE_PAGE_SIZE))
+    if st.session_state.get("kb_page", 1) > n_pages:
+        st.session_state["kb_page"] = n_pages
+    page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, step=1, key="kb_page") - 1
+    contents_page = contents[page * TABLE_PAGE_SIZE:(page + 1) * TABLE_PAGE_SIZE]
+
+    # Build the table rows
+    table_data = build_table_rows(
+        contents_page,
+        marked_content_ids,
+        st.session_state.mark_all_state,
+        st.session_state.delete_all_state,
+    )
 
     # --- 2. Render Table ---
-    # Add version to key to force editor refresh when clearing/selecting all
-    editor_key = f"kb_table_{current_session_id}_{st.session_state.get('file_uploader_key', 0)}_{st.session_state.kb_table_version}"
+    # The key only changes with the rows shown (filter, delete, add, page) or the select-all
+    # defaults, so the editor widget is reused across every other rerun
+    editor_key = f"kb_table_{current_session_id}_{hash((tuple(c.id for c in contents_page), st.session_state.mark_all_state, st.session_state.delete_all_state, st.session_state.kb_table_reset))}"
     
-    edited_df = st.data_editor(
-        df,
+    edited_rows = st.data_editor(
+        table_data,
         key=editor_key,
         hide_index=True,
         width='stretch',
@@ -453,17 +434,19 @@ def render(history_db=None):
             if not current_session_id:
                 st.error("No active session.")
             else:               
-                # 1. Identify what is currently visible/editable in the table
-                visible_metaids = set(edited_df["MetaID"].dropna().tolist())
-                
-                # 2. Identify what is selected in the UI (edited_df)
-                selected_rows = edited_df[edited_df["Mark"] == True]
-                selected_visible_metaids = set(selected_rows["MetaID"].dropna().tolist())
+                # 1. & 2. Identify what is visible in the table and what is selected in the UI (single pass)
+                visible_metaids = set()
+                selected_visible_metaids = set()
+                for r in edited_rows:
+                    metaid = r["MetaID"]
+                    if metaid:
+                        visible_metaids.add(metaid)
+                        if r["Mark"]:
+                            selected_visible_metaids.add(metaid)
                 
                 # 3. Identify what was marked in DB but is NOT currently visible (Hidden)
-                # marked_metaids comes from db logic at start of render
-                current_db_marked = set(marked_metaids)
-                hidden_marked = current_db_marked - visible_metaids
+                # marked_metaids_set comes from db logic at start of render
+                hidden_marked = marked_metaids_set.difference(visible_metaids)
                 
                 # 4. Merge: Hidden (preserved) + Visible (newly selected)
                 final_selection = list(hidden_marked | selected_visible_metaids)
@@ -472,7 +455,6 @@ def render(history_db=None):
                 
                 # Reset "Select All" state so it doesn't stick
                 st.session_state.mark_all_state = None
-                st.session_state.kb_table_version += 1
                 
                 st.success(f"Marked {len(final_selection)} documents!")
                 st.rerun()
@@ -480,21 +462,20 @@ def render(history_db=None):
     # [ACTION 2] Delete Selected
     with c_del:
         if st.button("🗑️ Delete Selected", use_container_width=True):
-            to_delete_rows = edited_df[edited_df["Delete"] == True]
-            if to_delete_rows.empty:
+            to_delete_rows = [r for r in edited_rows if r["Delete"]]
+            if not to_delete_rows:
                 st.warning("Select items in the 'Delete' column first.")
             else:
                 try:
                     with st.spinner(f"Deleting {len(to_delete_rows)} documents..."):
-                        for _, row in to_delete_rows.iterrows():
-                            # Use ID from the table
-                            knowledge.remove_content_by_id(row["ID"])
-                            if row["MetaID"]:
-                                db_logic.remove_document_from_usages(history_db, row["MetaID"])
+                        # One bulk DELETE per table instead of a round-trip per row
+                        kb_logic.remove_contents_bulk(knowledge, [row["ID"] for row in to_delete_rows])
+                        db_logic.remove_documents_from_usages_bulk(
+                            history_db, [row["MetaID"] for row in to_delete_rows if row["MetaID"]]
+                        )
                     
                     # Reset states
                     st.session_state.delete_all_state = None
-                    st.session_state.kb_table_version += 1
                     
                     st.success("Deleted successfully!")
                 except Exception as e:
@@ -507,13 +488,13 @@ def render(history_db=None):
     with c_edit:
         if st.button("✏️ Edit Selected", use_container_width=True):
             # Check marked OR delete columns for selection
-            selected_rows = edited_df[(edited_df["Edit"] == True)]
+            selected_rows = [r for r in edited_rows if r["Edit"]]
             
             if len(selected_rows) != 1:
                 st.warning("Please select exactly one file (via Mark or Delete checkbox) to edit.")
             else:
                 # [FIX] Lookup the original object using the ID
-                row_id = selected_rows.iloc[0]["ID"]
+                row_id = selected_rows[0]["ID"]
                 original_content = content_map.get(row_id) # <--- Retrieving from Map
                 
                 if original_content:
@@ -525,7 +506,114 @@ def render(history_db=None):
                         current_updated_at=str(original_content.updated_at),
                         knowledge=knowledge,
                     )
-    
+
+
+def render(history_db=None):
+    st.header("📚 Knowledge File Management")
+
+    if history_db is None:
+        history_db = db_logic.get_db()
+
+    # Verify connection first
+    if st.session_state.get('kb_active_type') != "PostgreSQL + PGVector" or not st.session_state.get('kb_confirmed_config'):
+        st.error("Please configure the PostgreSQL connection in 'Connect Database' first.")
+        return
+
+    # Initialize KB Connection
+    try:
+        knowledge = kb_logic.setup_knowledge_base(st.session_state['kb_config_key'], st.session_state['kb_confirmed_config'])
+    except Exception as e:
+        st.error(f"Could not connect to Knowledge Base: {e}")
+        return
+
+    col_add_url, col_add_file = st.columns(2)
+
+    # --- Add URLs ---
+    with col_add_url:
+        st.subheader("🌐 Add URLs")
+        urls_input = st.text_area("Enter URLs (one per line)", height=100)
+        if st.button("Add URLs"):
+            if urls_input:
+                urls = [url.strip() for url in urls_input.split('\n') if url.strip()]
+                if urls:
+                    with st.spinner("Processing URLs..."):
+                        progress = st.progress(0.0)
+                        try:
+                            # Ingest in fixed-size batches to bound memory and report progress
+                            for i in range(0, len(urls), URL_BATCH_SIZE):
+                                url_contents = [
+                                    {"url": url, "name": url, "metadata": {"metaid": str(uuid4())}}
+                                    for url in urls[i:i + URL_BATCH_SIZE]
+                                ]
+                                knowledge.add_contents(url_contents)
+                                progress.progress(min(1.0, (i + URL_BATCH_SIZE) / len(urls)))
+                            st.success(f"Added {len(urls)} URLs successfully!")
+                        except Exception as e:
+                            st.error(f"Error adding URLs: {e}")
+                    get_cached_contents.clear()
+                    kb_logic.setup_knowledge_base.clear()
+            else:
+                st.warning("Please enter at least one URL.")
+
+    # --- Add Files ---
+    with col_add_file:
+        if "file_uploader_key" not in st.session_state:
+            st.session_state["file_uploader_key"] = 0
+        st.subheader("📄 Add Files")
+        uploaded_files = st.file_uploader(
+            "Upload PDFs/Text", 
+            accept_multiple_files=True, 
+            key=f"uploader_{st.session_state['file_uploader_key']}"
+        )
+        
+        if st.button("Add File(s)", type="primary"):
+            if uploaded_files:
+                with st.spinner("📥 Loading documents..."):
+                    tmp_dir = pathlib.Path("tmp")
+                    tmp_dir.mkdir(parents=True, exist_ok=True)
+                    temp_paths = []
+
+                    def _persist(file):
+                        # Unique temp name per upload so concurrent sessions never collide;
+                        # each worker streams its file to disk and releases the GIL while writing
+                        with tempfile.NamedTemporaryFile(delete=False, dir=tmp_dir, suffix=pathlib.Path(file.name).suffix) as tf:
+                            temp_paths.append(pathlib.Path(tf.name))
+                            file.seek(0)
+                            shutil.copyfileobj(file, tf, 1 << 20)
+                        return pathlib.Path(tf.name)
+
+                    try:
+                        with ThreadPoolExecutor(max_workers=min(8, len(uploaded_files))) as ex:
+                            written_paths = list(ex.map(_persist, uploaded_files))
+
+                        contents_to_add = []
+                        for file, temp_path in zip(uploaded_files, written_paths):
+                            metaid = str(uuid4())
+                            contents_to_add.append({
+                                "path": str(temp_path),
+                                "name": file.name,
+                                "metadata": {"metaid": metaid},
+                            })
+
+                        if contents_to_add:
+                            knowledge.add_contents(contents_to_add)
+                            st.success(f"✅ Added {len(contents_to_add)} file(s)")
+                                
+                    except Exception as e:
+                        st.error(f"Error adding files: {e}")
+                    finally:
+                        # Always clean up, even if writing or ingestion failed part-way
+                        for path in temp_paths:
+                            if path.exists(): path.unlink()
+                    
+                    st.session_state["file_uploader_key"] += 1
+                    get_cached_contents.clear()
+                    kb_logic.setup_knowledge_base.clear()
+                    st.rerun()
+
+    st.divider()
+    st.subheader("🗄️ Stored Knowledge")
+    _table_block(knowledge, history_db, st.session_state.get("session_id"))
 
     st.divider()
     st.subheader("Quick Test Query 🔍")
@@ -46,33 +46,43 @@ def render_sidebar(history_db):
                 if st.button("🗑️ Delete Selected Chat", use_container_width=True):
                     db_logic.delete_marked_exchanges(history_db, st.session_state.get("session_id"))
                     st.session_state["history"] = []
+                    st.session_state["_loaded_history_sid"] = None
                     st.rerun()
-                st.markdown("""
-                    <style>
-                        div[class*="st-key-mark_container_"] div[data-testid="stCheckbox"] {
-                            margin-top: 0px !important;
-                        }
-                    </style>
-                    """, unsafe_allow_html=True)
+                # One pills widget for all markers instead of a checkbox per exchange
+                exchanges = {item["id"]: idx for idx, item in enumerate(display_history) if item.get("id")}
+                marked_ids = [item["id"] for item in display_history if item.get("id") and item.get("marked")]
+                # Key follows the DB state so the widget resets to it after every toggle/reload
+                state_key = hash(tuple((item.get("id"), bool(item.get("marked"))) for item in display_history))
+                selected_ids = st.pills(
+                    "Mark",
+                    options=list(exchanges),
+                    format_func=lambda msg_id: f"{exchanges[msg_id] + 1}",
+                    selection_mode="multi",
+                    default=marked_ids,
+                    key=f"mark_pills_{state_key}",
+                    label_visibility="collapsed",
+                    help="Mark chats to include them as important context",
+                )
+                changed = False
+                for item in display_history:
+                    msg_id = item.get("id")
+                    if not msg_id:
+                        continue
+                    is_marked = msg_id in selected_ids
+                    if is_marked != item.get("marked", False):
+                        db_logic.toggle_exchange_marker(history_db, msg_id, is_marked)
+                        item["marked"] = is_marked
+                        changed = True
+                if changed:
+                    st.rerun()
+
+                # All navigation links in a single markdown block
+                lines = []
                 for idx, item in enumerate(display_history):
-                    c_mark, c_link = st.columns([0.2, 0.8])
-                    with c_mark:
-                        msg_id = item.get("id")
-                        if msg_id:
-                            with st.container(key=f"mark_container_{msg_id}"):
-                                is_marked = st.checkbox(
-                                    "Mark", 
-                                    value=item.get("marked", False), 
-                                    key=f"mark_chk_{msg_id}", 
-                                    label_visibility="collapsed"
-                                )
-                                if is_marked != item.get("marked", False):
-                                    db_logic.toggle_exchange_marker(history_db, msg_id, is_marked)
-                                    item["marked"] = is_marked
-                                    st.rerun()
-                    with c_link:
-                        user_text = item.get("user", "")
-                        label = (user_text[:20] + '...') if len(user_text) > 20 else user_text or f"Msg {idx+1}"
-                        st.markdown(f"[{idx + 1}. {label}](#msg-{idx})")
+                    user_text = item.get("user", "")
+                    label = (user_text[:20] + '...') if len(user_text) > 20 else user_text or f"Msg {idx+1}"
+                    pin = "📌 " if item.get("marked") else ""
+                    lines.append(f"- {pin}[{idx + 1}. {label}](#msg-{idx})")
+                st.markdown("\n".join(lines))
             else:
                 st.caption("Start a conversation to see navigation.")
\ No newline at end of file
@@ -1,3 +1,4 @@
+import json
 import streamlit as st
 from uuid import uuid4
 from agno.agent import Agent
@@ -19,26 +20,38 @@ def create_model(provider, **kwargs):
         st.error(f"Error creating model: {e}")
         return None
 
-def get_knowledge(kb_type: str, kb_config: dict):
+def get_knowledge(kb_type: str, kb_config: dict, kb_config_key: str = None):
     if kb_type == "PostgreSQL + PGVector":
         try:
-            return kb_module.setup_knowledge_base(kb_config)
+            return kb_module.setup_knowledge_base(kb_config_key or kb_module.config_key(kb_config), kb_config)
         except Exception as e:
             return None
     return None
 
-def get_agent(model, system_prompt, kb_type, kb_config, session_id) -> Agent:
+def get_agent(model, system_prompt, kb_type, kb_config, session_id, kb_config_key=None) -> Agent:
     """
     system_prompt expected dict keys: 
     - description, instructions (list), additional_context, expected_output
     """
-    knowledge = get_knowledge(kb_type, kb_config)   
+    knowledge = get_knowledge(kb_type, kb_config, kb_config_key)   
     if not session_id:
         new_sid = str(uuid4())
         st.session_state['session_id'] = new_sid
         session_id = new_sid
 
-    return Agent(
+    # Reuse this browser session's Agent across reruns while its inputs are unchanged.
+    # model/knowledge are cached objects, so their identity changes exactly when they are rebuilt.
+    cache_key = (
+        id(model),
+        id(knowledge),
+        json.dumps(system_prompt, sort_keys=True, default=str),
+        session_id,
+    )
+    agent_cache = st.session_state.setdefault('_agent_cache', {})
+    if cache_key in agent_cache:
+        return agent_cache[cache_key]
+
+    agent = Agent(
         model=model,
         knowledge=knowledge,
         search_knowledge=True,
@@ -49,4 +62,7 @@ def get_agent(model, system_prompt, kb_type, kb_config, session_id) -> Agent:
         expected_output=system_prompt.get("expected_output"),
         session_id=session_id,
         markdown=True,
-    )
\ No newline at end of file
+    )
+    # Keep only the current agent; stale ones would pin old models/knowledge in memory
+    st.session_state['_agent_cache'] = {cache_key: agent}
+    return agent
@@ -1,112 +1,228 @@
 import time
 import json
-from sqlalchemy import text
+import functools
+from pathlib import Path
+from sqlalchemy import create_engine, event, text, bindparam
+from sqlalchemy.pool import QueuePool
 from agno.db.sqlite import SqliteDb
 
+# All app tables and their indexes, created once per process by _bootstrap_schema
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS chat_exchanges (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT,
+        user_content TEXT,
+        assistant_content TEXT,
+        timestamp INTEGER,
+        is_marked BOOLEAN DEFAULT 0
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS session_documents (
+        session_id TEXT,
+        metaid TEXT,
+        PRIMARY KEY (session_id, metaid)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS agent_configs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        config_json TEXT,
+        timestamp INTEGER
+    );
+    """,
+    # History is read per session in timestamp order; marked-only deletes and the
+    # document-removal path filter on is_marked / metaid
+    "CREATE INDEX IF NOT EXISTS idx_exchanges_sid_ts ON chat_exchanges(session_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_exchanges_sid_marked ON chat_exchanges(session_id, is_marked) WHERE is_marked = 1",
+    "CREATE INDEX IF NOT EXISTS idx_sessdocs_metaid ON session_documents(metaid)",
+]
+
+# Statements parsed once per process and reused by the helpers below
+_SQL_SESSION_LIST = text("SELECT DISTINCT session_id FROM chat_exchanges")
+_SQL_INSERT_EXCHANGE = text("""
+    INSERT INTO chat_exchanges (session_id, user_content, assistant_content, timestamp, is_marked)
+    VALUES (:session_id, :user_content, :assistant_content, :timestamp, 0);
+""")
+_SQL_TOGGLE_MARKER = text("UPDATE chat_exchanges SET is_marked = :val WHERE id = :id AND is_marked <> :val")
+_SQL_LOAD_HISTORY = text("""
+    SELECT id, user_content, assistant_content, is_marked
+    FROM chat_exchanges 
+    WHERE session_id = :session_id 
+    ORDER BY timestamp ASC
+""")
+_SQL_DELETE_SESSION_EXCHANGES = text("DELETE FROM chat_exchanges WHERE session_id = :sid")
+_SQL_DELETE_MARKED_EXCHANGES = text("DELETE FROM chat_exchanges WHERE session_id = :sid AND is_marked = 1")
+_SQL_DELETE_SESSION_DOCS = text("DELETE FROM session_documents WHERE session_id = :sid")
+_SQL_DELETE_UNSELECTED_DOCS = text(
+    "DELETE FROM session_documents WHERE session_id = :sid AND metaid NOT IN :keep"
+).bindparams(bindparam("keep", expanding=True))
+_SQL_INSERT_SESSION_DOC = text(
+    "INSERT INTO session_documents (session_id, metaid) VALUES (:sid, :mid) ON CONFLICT DO NOTHING"
+)
+_SQL_SESSION_DOCS = text("SELECT metaid FROM session_documents WHERE session_id = :sid")
+_SQL_DELETE_DOC_USAGES = text("DELETE FROM session_documents WHERE metaid = :mid")
+_SQL_DELETE_DOCS_USAGES = text("DELETE FROM session_documents WHERE metaid IN :mids").bindparams(
+    bindparam("mids", expanding=True)
+)
+_SQL_INSERT_AGENT_CONFIG = text("""
+    INSERT INTO agent_configs (name, config_json, timestamp)
+    VALUES (:name, :config_json, :timestamp)
+""")
+_SQL_LIST_AGENT_CONFIGS = text("SELECT id, name, config_json, timestamp FROM agent_configs ORDER BY timestamp DESC")
+_SQL_AGENT_CONFIG_SUMMARY = text("SELECT id, name, timestamp FROM agent_configs ORDER BY timestamp DESC")
+_SQL_GET_AGENT_CONFIG = text("SELECT config_json FROM agent_configs WHERE id = :id")
+_SQL_DELETE_AGENT_CONFIG = text("DELETE FROM agent_configs WHERE id = :id")
+
+def _bootstrap_schema(db: SqliteDb):
+    """Creates the app tables in a single transaction, so helpers don't re-run DDL per call."""
+    try:
+        with db.db_engine.begin() as conn:
+            for ddl in _SCHEMA:
+                conn.execute(text(ddl))
+    except Exception as e:
+        print(f"Error creating chat tables: {e}")
+
+def _set_pragmas(dbapi_conn, _record):
+    """WAL lets history reads run alongside chat writes; NORMAL sync is safe under WAL."""
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")
+    cur.execute("PRAGMA cache_size=-65536")
+    cur.execute("PRAGMA busy_timeout=5000")
+    cur.close()
+
+@functools.lru_cache(maxsize=None)
+def _open_db(db_path: str) -> SqliteDb:
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        poolclass=QueuePool,
+        pool_size=8,
+        max_overflow=16,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+    )
+    event.listen(engine, "connect", _set_pragmas)
+    db = SqliteDb(db_engine=engine, db_file=db_path)
+    _bootstrap_schema(db)
+    return db
+
 def get_db(db_path: str = "tmp/custom_chat.db") -> SqliteDb:
-    """Returns the database instance."""
-    return SqliteDb(db_file=db_path)
+    """Returns the database instance (one pooled engine per file, shared across reruns)."""
+    return _open_db(str(Path(db_path).resolve()))
+
+# --- READ CACHE ---
+# Every rerun re-reads the session list, history and saved configs; keep them for a few
+# seconds in-process and let each mutator evict what it touched.
+_READ_CACHE_TTL = 5
+_read_cache = {}
+
+def _cache_get(db, *key):
+    hit = _read_cache.get((db.db_file, *key))
+    if hit and time.monotonic() - hit[0] < _READ_CACHE_TTL:
+        return hit[1]
+    return None
+
+def _cache_put(db, value, *key):
+    _read_cache[(db.db_file, *key)] = (time.monotonic(), value)
+
+def _invalidate(db, kind: str, session_id: str = None):
+    """Evicts cached reads of one kind, for one session or (session_id=None) for all of them."""
+    for key in list(_read_cache):
+        if key[0] == db.db_file and key[1] == kind and (session_id is None or key[2:] == (session_id,)):
+            _read_cache.pop(key, None)
 
 def load_session_list(db: SqliteDb):
     """Retrieves a list of available session IDs."""
+    cached = _cache_get(db, "sessions")
+    if cached is not None:
+        return list(cached)
+
     sess_list = []
     try:
         with db.Session() as sess:
-            stmt = text("SELECT DISTINCT session_id FROM chat_exchanges")
-            rows = sess.execute(stmt).fetchall()
+            rows = sess.execute(_SQL_SESSION_LIST).fetchall()
             for r in rows:
                 if r[0]: sess_list.append(r[0])
+        _cache_put(db, sess_list, "sessions")
     except Exception:
         pass
-    return sess_list
+    return list(sess_list)
 
 def save_exchange_to_db(db, session_id: str, user_content: str, assistant_content: str):
-    """Saves a complete conversation turn."""
+    """Saves a complete conversation turn. Returns the new exchange id (None on failure)."""
     if not db or not session_id:
-        return
+        return None
 
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS chat_exchanges (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        session_id TEXT,
-        user_content TEXT,
-        assistant_content TEXT,
-        timestamp INTEGER,
-        is_marked BOOLEAN DEFAULT 0
-    );
-    """
-    
-    insert_sql = """
-    INSERT INTO chat_exchanges (session_id, user_content, assistant_content, timestamp, is_marked)
-    VALUES (:session_id, :user_content, :assistant_content, :timestamp, 0);
-    """
-    
     try:
         with db.Session() as sess:
-            sess.execute(text(create_table_sql))
-            sess.execute(text(insert_sql), {
+            result = sess.execute(_SQL_INSERT_EXCHANGE, {
                 "session_id": session_id,
                 "user_content": user_content,
                 "assistant_content": assistant_content,
                 "timestamp": int(time.time())
             })
             sess.commit()
+            _invalidate(db, "history", session_id)
+            _invalidate(db, "sessions")
+            return result.lastrowid
     except Exception as e:
         print(f"Error saving exchange to DB: {e}")
+        return None
 
 def toggle_exchange_marker(db, exchange_id: int, new_value: bool):
     """Updates the marked status of a specific exchange."""
-    sql = "UPDATE chat_exchanges SET is_marked = :val WHERE id = :id"
     try:
         with db.Session() as sess:
-            sess.execute(text(sql), {"val": 1 if new_value else 0, "id": exchange_id})
+            result = sess.execute(_SQL_TOGGLE_MARKER, {"val": 1 if new_value else 0, "id": exchange_id})
+            if result.rowcount == 0:
+                # Already in the requested state: nothing to commit or invalidate
+                return
             sess.commit()
+        # Only the exchange id is known here, so drop every cached history
+        _invalidate(db, "history")
     except Exception as e:
         print(f"Error toggling marker: {e}")
 
 def load_history_from_db(db, session_id: str):
     """Loads conversation pairs."""
-    history = []
     if not session_id:
-        return history
+        return []
 
-    sql = """
-    SELECT id, user_content, assistant_content, is_marked
-    FROM chat_exchanges 
-    WHERE session_id = :session_id 
-    ORDER BY timestamp ASC
-    """
-    
-    try:
-        with db.Session() as sess:
-            check_table = text("SELECT name FROM sqlite_master WHERE type='table' AND name='chat_exchanges'")
-            if not sess.execute(check_table).fetchone():
-                return []
+    # Cached as plain row tuples; every call hands out fresh dicts, since callers
+    # flip "marked" and fill in pending turns in place
+    rows = _cache_get(db, "history", session_id)
+    if rows is None:
+        try:
+            with db.Session() as sess:
+                rows = [tuple(r) for r in sess.execute(_SQL_LOAD_HISTORY, {"session_id": session_id})]
+            _cache_put(db, rows, "history", session_id)
+        except Exception as e:
+            print(f"DB Load Error: {e}")
+            return []
 
-            rows = sess.execute(text(sql), {"session_id": session_id}).fetchall()
-            
-            for row in rows:
-                history.append({
-                    "id": row.id,
-                    "user": row.user_content,
-                    "assistant": row.assistant_content,
-                    "marked": bool(row.is_marked)
-                })
-                
-    except Exception as e:
-        print(f"DB Load Error: {e}")
-        
-    return history
+    return [
+        {"id": ex_id, "user": user, "assistant": assistant, "marked": bool(marked)}
+        for ex_id, user, assistant, marked in rows
+    ]
 
 def delete_session(db, session_id: str):
     """Deletes a session (chat history and associated documents) from the DB."""
     try:
         with db.Session() as sess:
             # 1. Delete the chat history
-            sess.execute(text("DELETE FROM chat_exchanges WHERE session_id = :sid"), {"sid": session_id}) 
+            sess.execute(_SQL_DELETE_SESSION_EXCHANGES, {"sid": session_id}) 
             # 2. Delete the associated marked documents configuration
-            sess.execute(text("DELETE FROM session_documents WHERE session_id = :sid"), {"sid": session_id})            
+            sess.execute(_SQL_DELETE_SESSION_DOCS, {"sid": session_id})
             sess.commit()
+        _invalidate(db, "history", session_id)
+        _invalidate(db, "sessions")
+        _invalidate(db, "documents", session_id)
     except Exception as e:
         print(f"Error deleting session: {e}")
 
@@ -114,23 +230,15 @@ def delete_marked_exchanges(db, session_id: str):
     """Deletes all marked exchanges for a session."""
     try:
         with db.Session() as sess:
-            sess.execute(text("DELETE FROM chat_exchanges WHERE session_id = :sid AND is_marked = 1"), {"sid": session_id})
+            sess.execute(_SQL_DELETE_MARKED_EXCHANGES, {"sid": session_id})
             sess.commit()
+        _invalidate(db, "history", session_id)
+        _invalidate(db, "sessions")
     except Exception as e:
         print(f"Error deleting marked exchanges: {e}")
 
 # --- DOCUMENT MANAGEMENT ---
 
-def ensure_session_docs_table(sess):
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS session_documents (
-        session_id TEXT,
-        metaid TEXT,
-        PRIMARY KEY (session_id, metaid)
-    );
-    """
-    sess.execute(text(create_table_sql))
-
 def save_session_documents(db, session_id: str, metaids: list):
     """Saves the list of marked document metaids for a session (Full Refresh)."""
     if not db or not session_id:
@@ -138,18 +246,18 @@ def save_session_documents(db, session_id: str, metaids: list):
 
     try:
         with db.Session() as sess:
-            ensure_session_docs_table(sess)
-            
-            # Clear existing selection for this session
-            sess.execute(text("DELETE FROM session_documents WHERE session_id = :sid"), {"sid": session_id})
-            
-            # Insert new selection
             if metaids:
-                insert_sql = "INSERT INTO session_documents (session_id, metaid) VALUES (:sid, :mid)"
-                for mid in metaids:
-                    sess.execute(text(insert_sql), {"sid": session_id, "mid": mid})
+                # Drop only the rows that are no longer selected
+                sess.execute(_SQL_DELETE_UNSELECTED_DOCS, {"sid": session_id, "keep": list(metaids)})
+
+                # Add the new ones in one batched insert; rows already present are skipped
+                sess.execute(_SQL_INSERT_SESSION_DOC, [{"sid": session_id, "mid": mid} for mid in metaids])
+            else:
+                # Clear existing selection for this session
+                sess.execute(_SQL_DELETE_SESSION_DOCS, {"sid": session_id})
             
             sess.commit()
+        _invalidate(db, "documents", session_id)
     except Exception as e:
         print(f"Error saving session documents: {e}")
 
@@ -158,12 +266,16 @@ def get_session_documents(db, session_id: str) -> list:
     if not db or not session_id:
         return []
 
+    # Shared by every browser tab; writers below invalidate it, the TTL bounds anything else
+    cached = _cache_get(db, "documents", session_id)
+    if cached is not None:
+        return list(cached)
+
     try:
         with db.Session() as sess:
-            ensure_session_docs_table(sess)
-            sql = text("SELECT metaid FROM session_documents WHERE session_id = :sid")
-            rows = sess.execute(sql, {"sid": session_id}).fetchall()
-            return [row[0] for row in rows]
+            metaids = tuple(row[0] for row in sess.execute(_SQL_SESSION_DOCS, {"sid": session_id}).fetchall())
+        _cache_put(db, metaids, "documents", session_id)
+        return list(metaids)
     except Exception as e:
         print(f"Error loading session documents: {e}")
         return []
@@ -175,24 +287,26 @@ def remove_document_from_usages(db, metaid: str):
         
     try:
         with db.Session() as sess:
-            ensure_session_docs_table(sess)
-            sess.execute(text("DELETE FROM session_documents WHERE metaid = :mid"), {"mid": metaid})
+            sess.execute(_SQL_DELETE_DOC_USAGES, {"mid": metaid})
             sess.commit()
+        _invalidate(db, "documents")
     except Exception as e:
         print(f"Error removing document usages: {e}")
 
-# --- AGENT CONFIGURATION MANAGEMENT ---
+def remove_documents_from_usages_bulk(db, metaids: list):
+    """Removes several documents from ALL sessions in a single DELETE (used when files are deleted)."""
+    if not db or not metaids:
+        return
 
-def ensure_agent_configs_table(sess):
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS agent_configs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        config_json TEXT,
-        timestamp INTEGER
-    );
-    """
-    sess.execute(text(create_table_sql))
+    try:
+        with db.Session() as sess:
+            sess.execute(_SQL_DELETE_DOCS_USAGES, {"mids": list(metaids)})
+            sess.commit()
+        _invalidate(db, "documents")
+    except Exception as e:
+        print(f"Error removing document usages: {e}")
+
+# --- AGENT CONFIGURATION MANAGEMENT ---
 
 def save_agent_config(db, name: str, config_data: dict):
     """Saves the current agent configuration (params + prompt)."""
@@ -201,21 +315,18 @@ def save_agent_config(db, name: str, config_data: dict):
     
     try:
         with db.Session() as sess:
-            ensure_agent_configs_table(sess)
             # Check if name exists to update or insert new (optional, here we just insert new for history)
             # For simplicity, let's just insert a new record. 
             # If you want unique names, you'd check first.
             
-            insert_sql = """
-            INSERT INTO agent_configs (name, config_json, timestamp)
-            VALUES (:name, :config_json, :timestamp)
-            """
-            sess.execute(text(insert_sql), {
+            sess.execute(_SQL_INSERT_AGENT_CONFIG, {
                 "name": name,
                 "config_json": json.dumps(config_data),
                 "timestamp": int(time.time())
             })
             sess.commit()
+        _invalidate(db, "configs")
+        _invalidate(db, "configs_summary")
         return True
     except Exception as e:
         print(f"Error saving agent config: {e}")
@@ -226,12 +337,14 @@ def list_agent_configs(db):
     configs = []
     if not db:
         return configs
+
+    cached = _cache_get(db, "configs")
+    if cached is not None:
+        return [dict(c) for c in cached]
         
     try:
         with db.Session() as sess:
-            ensure_agent_configs_table(sess)
-            sql = text("SELECT id, name, config_json, timestamp FROM agent_configs ORDER BY timestamp DESC")
-            rows = sess.execute(sql).fetchall()
+            rows = sess.execute(_SQL_LIST_AGENT_CONFIGS).fetchall()
             for row in rows:
                 configs.append({
                     "id": row[0],
@@ -239,16 +352,52 @@ def list_agent_configs(db):
                     "config": json.loads(row[2]),
                     "timestamp": row[3]
                 })
+        _cache_put(db, configs, "configs")
+    except Exception as e:
+        print(f"Error listing agent configs: {e}")
+    return [dict(c) for c in configs]
+
+def list_agent_configs_summary(db):
+    """Returns id/name/timestamp of the saved agent configurations, without parsing their JSON."""
+    if not db:
+        return []
+
+    cached = _cache_get(db, "configs_summary")
+    if cached is not None:
+        return [dict(c) for c in cached]
+
+    try:
+        with db.Session() as sess:
+            configs = [
+                {"id": cfg_id, "name": name, "timestamp": ts}
+                for cfg_id, name, ts in sess.execute(_SQL_AGENT_CONFIG_SUMMARY)
+            ]
+        _cache_put(db, configs, "configs_summary")
+        return [dict(c) for c in configs]
     except Exception as e:
         print(f"Error listing agent configs: {e}")
-    return configs
+        return []
+
+def get_agent_config(db, config_id: int):
+    """Loads and parses one saved agent configuration (None if missing)."""
+    if not db:
+        return None
+
+    try:
+        with db.Session() as sess:
+            row = sess.execute(_SQL_GET_AGENT_CONFIG, {"id": config_id}).fetchone()
+        return json.loads(row[0]) if row else None
+    except Exception as e:
+        print(f"Error loading agent config: {e}")
+        return None
 
 def delete_agent_config(db, config_id: int):
     """Deletes a specific agent configuration."""
     try:
         with db.Session() as sess:
-            ensure_agent_configs_table(sess)
-            sess.execute(text("DELETE FROM agent_configs WHERE id = :id"), {"id": config_id})
+            sess.execute(_SQL_DELETE_AGENT_CONFIG, {"id": config_id})
             sess.commit()
+        _invalidate(db, "configs")
+        _invalidate(db, "configs_summary")
     except Exception as e:
         print(f"Error deleting agent config: {e}")
\ No newline at end of file
@@ -1,80 +1,340 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, select, update, func, bindparam, and_, or_, not_, true, false, Text
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 from agno.knowledge import Knowledge
 from agno.vectordb.pgvector import PgVector
 from agno.db.postgres import PostgresDb
-from agno.knowledge.embedder.ollama import OllamaEmbedder
+from agno.db.schemas.knowledge import KnowledgeRow
 from agno.vectordb.search import SearchType
-# from agno.utils.log import logger
+from agno.utils.log import logger
 import streamlit as st
 import os
+import re
+import functools
+import threading
+from typing import Optional
+import json
+import hashlib
 from dotenv import load_dotenv
 # for debugging
 import time
 # reranker
-from src.utils.heuristic_reranker import OllamaHeuristicReranker
+from src.utils.heuristic_reranker import HeuristicReranker, OllamaHeuristicReranker, XEncoderHeuristicReranker
+# batched embeddings
+from src.utils.ollama_batch_embedder import BatchOllamaEmbedder
 
 load_dotenv()
 
+# Whitelisted sort options for the contents table: label -> (column, direction)
+CONTENT_SORT_OPTIONS = {
+    "Newest first": ("updated_at", "desc"),
+    "Oldest first": ("updated_at", "asc"),
+    "Name (A-Z)": ("name", "asc"),
+    "Name (Z-A)": ("name", "desc"),
+}
+
+_DB_NAME_RE = re.compile(r"[A-Za-z0-9_]+")
+_CHECK_DB_SQL = text("SELECT 1 FROM pg_database WHERE datname = :d")
+
+# AUTOCOMMIT engines on the 'postgres' db, one per server/login, reused across config changes
+_root_engines = {}
+# Streamlit runs sessions' scripts in concurrent threads; without it two could each build an engine for one URL
+_engines_lock = threading.Lock()
+
+def _root_engine(kb_config: dict):
+    key = (kb_config['host'], kb_config['port'], kb_config['user'], kb_config['password'])
+    with _engines_lock:
+        engine = _root_engines.get(key)
+        if engine is None:
+            root_url = f"postgresql+psycopg://{kb_config['user']}:{kb_config['password']}@{kb_config['host']}:{kb_config['port']}/postgres"
+            engine = create_engine(root_url, isolation_level="AUTOCOMMIT", pool_size=1, pool_pre_ping=True)
+            _root_engines[key] = engine
+        return engine
+
+# Pooled engines on the KB databases, one per URL. setup_knowledge_base is rebuilt after every
+# cache clear; a fresh engine each time would leave the old pools' connections open
+_kb_engines = {}
+
+def _kb_engine(db_url: str):
+    with _engines_lock:
+        engine = _kb_engines.get(db_url)
+        if engine is None:
+            engine = create_engine(db_url, pool_pre_ping=True, connect_args={"prepare_threshold": 0})
+            _kb_engines[db_url] = engine
+        return engine
+
 @st.cache_resource
 def ensure_database_exists(kb_config: dict):
     target_db = kb_config['db']
+    if not _DB_NAME_RE.fullmatch(target_db or ""):
+        raise ValueError(f"Invalid database name: {target_db!r} (letters, digits and '_' only)")
     # Connect to 'postgres' db to check/create target db
-    root_url = f"postgresql+psycopg://{kb_config['user']}:{kb_config['password']}@{kb_config['host']}:{kb_config['port']}/postgres"
-    engine = create_engine(root_url, isolation_level="AUTOCOMMIT")
+    engine = _root_engine(kb_config)
     try:
         with engine.connect() as conn:
-            check_sql = text(f"SELECT 1 FROM pg_database WHERE datname='{target_db}'")
-            exists = conn.execute(check_sql).fetchone()
+            exists = conn.execute(_CHECK_DB_SQL, {"d": target_db}).fetchone()
             if not exists:
-                create_sql = text(f'CREATE DATABASE "{target_db}"')
+                # CREATE DATABASE can't take a bind parameter; the name was validated above
+                create_sql = text(f"CREATE DATABASE {conn.dialect.identifier_preparer.quote_identifier(target_db)}")
                 conn.execute(create_sql)
         return True
     except Exception as e:
         # It's possible the DB already exists or connection failed; just proceed/raise
         raise e
-    finally:
-        engine.dispose()
 
-@st.cache_resource
-def setup_knowledge_base(kb_config: dict) -> Knowledge:
-    ensure_database_exists(kb_config)
-    db_url = f"postgresql+psycopg://{kb_config['user']}:{kb_config['password']}@{kb_config['host']}:{kb_config['port']}/{kb_config['db']}"
-
-    embedder = OllamaEmbedder(
-        id="embeddinggemma:latest", 
-        dimensions=768, 
-        host=os.getenv("OLLAMA_HOST", "http://localhost:11434")
+@st.cache_resource(show_spinner=False)
+def ensure_content_indexes(db_url: str, _contents_db: PostgresDb):
+    """
+    Creates the secondary indexes used by the contents filters, sort and metaid lookups (idempotent).
+    Runs once per database, not on every knowledge base rebuild; a failure raises and is not cached.
+    """
+    contents_db = _contents_db
+    table = contents_db._get_table(table_type="knowledge", create_table_if_not_found=True)
+    if table is None:
+        return
+
+    index_sql = [
+        f"CREATE INDEX IF NOT EXISTS ix_kc_name_lower ON {table.fullname} (lower(name))",
+        f"CREATE INDEX IF NOT EXISTS ix_kc_status ON {table.fullname} (status)",
+        f"CREATE INDEX IF NOT EXISTS ix_kc_updated_at ON {table.fullname} (updated_at DESC)",
+        f"CREATE INDEX IF NOT EXISTS ix_kc_metaid ON {table.fullname} ((metadata->>'metaid'))",
+        f"CREATE INDEX IF NOT EXISTS ix_kc_metadata_gin ON {table.fullname} USING gin (metadata jsonb_path_ops)",
+    ]
+    with contents_db.Session() as sess, sess.begin():
+        for sql in index_sql:
+            sess.execute(text(sql))
+
+def config_key(kb_config: dict) -> str:
+    """Stable hash of a KB config, computed once when the config is confirmed and used as the cache key."""
+    return hashlib.sha256(json.dumps(kb_config, sort_keys=True, default=str).encode()).hexdigest()
+
+@functools.lru_cache(maxsize=4)
+def get_embedder(model_id: str, host: str, dimensions: int = 768) -> BatchOllamaEmbedder:
+    """
+    One embedder per (model, host), shared by every knowledge base built in this process,
+    so its HTTP client and keep-alive connections survive KB cache clears and config changes.
+    Its async client is per event loop (see BatchOllamaEmbedder.aclient), not shared.
+    """
+    return BatchOllamaEmbedder(id=model_id, dimensions=dimensions, host=host)
+
+# Unbounded on purpose: an evicted reranker would keep its HTTP pool and keepalive thread alive
+# with nothing left to shut them down, while cached knowledge bases may still be using it
+@functools.lru_cache(maxsize=None)
+def get_reranker(
+    reranker_type: str,
+    model: str,
+    top_n: Optional[int],
+    score_threshold: Optional[float],
+    collected_number: Optional[int],
+    reasoning: bool = False,
+    add_few_shot: bool = False,
+    max_workers: int = 1,
+    keepalive_interval: Optional[float] = None,
+    endpoint: Optional[str] = None,
+) -> HeuristicReranker:
+    """
+    One reranker per settings, shared by every knowledge base built in this process, so its
+    connection pool, keepalive thread and warm model survive KB cache clears and DB config changes.
+    The instance is shared: don't mutate its attributes, ask for one with other settings instead.
+    """
+    if reranker_type == "Cross-encoder":
+        return XEncoderHeuristicReranker(
+            model = model,
+            endpoint = endpoint or os.getenv("RERANK_ENDPOINT", "http://localhost:8001/rerank"),
+            top_n = top_n,
+            score_threshold = score_threshold,
+            collected_number = collected_number,
+            max_workers = max_workers
+        )
+    return OllamaHeuristicReranker(
+        model = model,
+        host = os.getenv("OLLAMA_HOST", "http://localhost:11434"),
+        top_n = top_n,
+        score_threshold = score_threshold,
+        collected_number = collected_number,
+        reasoning = reasoning,
+        add_few_shot = add_few_shot,
+        max_workers = max_workers,
+        keepalive_interval = keepalive_interval
     )
 
-    if kb_config['reranker_type'] == "Heuristic":
-        reranker = OllamaHeuristicReranker(
-            model = kb_config['reranker_model'],
-            host = os.getenv("OLLAMA_HOST", "http://localhost:11434"),
-            top_n = kb_config['top_n'],
-            score_threshold = kb_config['score_threshold'],
-            collected_number = kb_config['collected_number'],
-            reasoning = kb_config['reasoning'],
-            add_few_shot = kb_config['few_shot']
+@st.cache_resource
+def setup_knowledge_base(kb_config_key: str, _kb_config: dict) -> Knowledge:
+    ensure_database_exists(_kb_config)
+    db_url = f"postgresql+psycopg://{_kb_config['user']}:{_kb_config['password']}@{_kb_config['host']}:{_kb_config['port']}/{_kb_config['db']}"
+    # One pooled engine shared by the vector table and the contents table, reused across rebuilds
+    db_engine = _kb_engine(db_url)
+
+    embedder = get_embedder("embeddinggemma:latest", os.getenv("OLLAMA_HOST", "http://localhost:11434"))
+
+    reranker = None
+    if _kb_config['reranker_type'] != 'None':
+        reranker = get_reranker(
+            reranker_type = _kb_config['reranker_type'],
+            model = _kb_config['reranker_model'],
+            top_n = _kb_config['top_n'],
+            score_threshold = _kb_config['score_threshold'],
+            collected_number = _kb_config['collected_number'],
+            reasoning = _kb_config['reasoning'],
+            add_few_shot = _kb_config['few_shot'],
+            max_workers = _kb_config.get('max_workers', 1),
+            keepalive_interval = _kb_config.get('keepalive_interval'),
+            endpoint = _kb_config.get('rerank_endpoint', os.getenv("RERANK_ENDPOINT", "http://localhost:8001/rerank")),
         )
 
     vector_db = PgVector(
-        table_name=kb_config['table_name'],
-        db_url=db_url,
+        table_name=_kb_config['table_name'],
+        db_engine=db_engine,
         search_type=SearchType.hybrid,
         embedder=embedder,
-        reranker = reranker if kb_config['reranker_type'] != 'None' else None
+        reranker=reranker
     )
 
     contents_db = PostgresDb(
-        db_url=db_url,
+        db_engine=db_engine,
         knowledge_table="knowledge_contents"
     )
+    try:
+        ensure_content_indexes(db_url, contents_db)
+    except Exception as e:
+        # Missing indexes only cost speed; don't fail the knowledge base over them
+        logger.warning(f"Could not create knowledge content indexes: {e}")
 
     knowledge = Knowledge(
         vector_db=vector_db, 
         contents_db=contents_db,
-        max_results=kb_config.get('max_results', 10),
-        name=kb_config.get('knowledge_name', 'Agno Knowledge Base')
+        max_results=_kb_config.get('max_results', 10),
+        name=_kb_config.get('knowledge_name', 'Agno Knowledge Base')
     )
 
-    return knowledge
\ No newline at end of file
+    return knowledge
+
+def _name_predicate(name_col, search_str: str):
+    """
+    Translates the name search grammar ("a and b or c") into SQL:
+    OR of AND-groups, each term a case-insensitive substring match.
+    """
+    groups = []
+    for group in search_str.lower().strip().split(' or '):
+        terms = [t.strip() for t in group.split(' and ') if t.strip()]
+        groups.append(and_(true(), *[func.lower(name_col).contains(t, autoescape=True) for t in terms]))
+    return or_(*groups)
+
+def query_knowledge_contents(
+    knowledge: Knowledge,
+    *,
+    ids=None,
+    name: str = None,
+    status: str = None,
+    meta_key: str = None,
+    meta_value: str = None,
+    relation: str = "in",
+    marked_metaids=(),
+    sort_key: str = "Newest first",
+    limit: int = None,
+    offset: int = None,
+):
+    """
+    Fetches contents with the name/status/metadata predicate, the id subset and the
+    ordering (whitelisted column) all applied by Postgres, so only matching rows are loaded.
+    The is_marked flag is computed in the same query from the session's marked metaids.
+    Returns (contents, ids of the marked contents).
+    """
+    column, direction = CONTENT_SORT_OPTIONS.get(sort_key, CONTENT_SORT_OPTIONS["Newest first"])
+    contents_db = knowledge.contents_db
+    table = contents_db._get_table(table_type="knowledge")
+    if table is None:
+        return [], set()
+
+    conditions = []
+    if ids is not None:
+        conditions.append(table.c.id.in_(list(ids)))
+    if name:
+        match = _name_predicate(table.c.name, name)
+        conditions.append(not_(match) if relation == "not in" else match)
+    if status:
+        status_match = func.lower(table.c.status) == status.lower()
+        conditions.append(not_(status_match) if relation == "is not" else status_match)
+    if meta_key and meta_value:
+        meta_col = table.c["metadata"][meta_key].astext
+        meta_match = meta_col.contains(str(meta_value), autoescape=True)
+        conditions.append(meta_col.isnot(None))
+        conditions.append(not_(meta_match) if relation == "not in" else meta_match)
+
+    if marked_metaids:
+        is_marked = table.c["metadata"]["metaid"].astext.in_(list(marked_metaids))
+    else:
+        is_marked = false()
+
+    order = table.c[column].asc() if direction == "asc" else table.c[column].desc()
+    stmt = select(table, is_marked.label("is_marked")).where(*conditions).order_by(order)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    if offset:
+        stmt = stmt.offset(offset)
+
+    with contents_db.Session() as sess:
+        rows = sess.execute(stmt).fetchall()
+
+    contents = [KnowledgeRow.model_validate(row._mapping) for row in rows]
+    marked_ids = {c.id for c, row in zip(contents, rows) if row.is_marked}
+    return contents, marked_ids
+
+def update_content_fields(
+    knowledge: Knowledge,
+    content_id: str,
+    name: str = None,
+    description: str = None,
+    metadata_patch: dict = None,
+    removed_keys: list = None,
+):
+    """
+    Updates only the given fields of a content row.
+    Metadata is patched in place (metadata - removed_keys || patch), on the contents row and,
+    in the same transaction, on the vector rows (meta_data and filters); the vector rows are
+    only touched when metadata actually changed.
+    """
+    contents_db = knowledge.contents_db
+    table = contents_db._get_table(table_type="knowledge")
+    if table is None:
+        return
+
+    values = {"updated_at": int(time.time())}
+    if name is not None:
+        values["name"] = name
+    if description is not None:
+        values["description"] = description
+    metadata_changed = bool(metadata_patch or removed_keys)
+
+    def patched(column):
+        current = func.coalesce(column, text("'{}'::jsonb"))
+        if removed_keys:
+            current = current.op("-")(bindparam("removed_keys", list(removed_keys), type_=ARRAY(Text), unique=True))
+        return current.op("||")(bindparam("patch", metadata_patch or {}, type_=JSONB, unique=True))
+
+    if metadata_changed:
+        values["metadata"] = patched(table.c["metadata"])
+
+    with contents_db.Session() as sess, sess.begin():
+        sess.execute(update(table).where(table.c.id == content_id).values(**values))
+        if metadata_changed and knowledge.vector_db is not None:
+            # Not PgVector.update_metadata: it only merges, so removed keys would keep matching filters
+            vector_table = knowledge.vector_db.table
+            sess.execute(
+                update(vector_table)
+                .where(vector_table.c.content_id == content_id)
+                .values(meta_data=patched(vector_table.c.meta_data), filters=patched(vector_table.c.filters))
+            )
+
+def remove_contents_bulk(knowledge: Knowledge, ids: list):
+    """Deletes several contents and their vectors in one transaction (one DELETE per table)."""
+    if not ids:
+        return
+
+    contents_db = knowledge.contents_db
+    table = contents_db._get_table(table_type="knowledge")
+    with contents_db.Session() as sess, sess.begin():
+        if knowledge.vector_db is not None:
+            vector_table = knowledge.vector_db.table
+            sess.execute(vector_table.delete().where(vector_table.c.content_id.in_(list(ids))))
+        if table is not None:
+            sess.execute(table.delete().where(table.c.id.in_(list(ids))))
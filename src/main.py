@@ -23,25 +23,25 @@ DB_FILE = "tmp/custom_chat.db"
 history_db = db_logic.get_db(DB_FILE)
 
 def main():
-    # 1. Component Auto-Initialization
-    session_config.auto_initialize()
-    knowledge_config.auto_initialize()
+    # 1. Component Auto-Initialization + 2. Global State Safety Checks, once per browser session
+    if not st.session_state.get("_bootstrapped"):
+        session_config.auto_initialize()
+        knowledge_config.auto_initialize()
+        st.session_state.setdefault("current_view", "chat_interface")
+        st.session_state.setdefault("running", None)
+        st.session_state.setdefault("current_chat", [])
+        st.session_state["_bootstrapped"] = True
+    # Retried on every rerun until a model exists (Ollama/API may be unreachable at first load);
+    # a no-op once st.session_state['model'] is set
+    agent_config.auto_initialize()
+    # Knowledge filters follow the active session, which can change on any rerun (cheap: cached)
     knowledge_ui.auto_initialize(history_db)
-    agent_config.auto_initialize() 
 
-    # 2. Global State Safety Checks
-    if "current_view" not in st.session_state:
-        st.session_state["current_view"] = "chat_interface"
-    if "running" not in st.session_state:
-        st.session_state["running"] = None
-    if "current_chat" not in st.session_state:
-        st.session_state["current_chat"] = []
-
-    # 3. Load History
-    if st.session_state.get("session_id") and not st.session_state.history:
-        st.session_state.history = db_logic.load_history_from_db(
-            history_db, st.session_state.get("session_id")
-        )
+    # 3. Load History (once per session switch; clear _loaded_history_sid to force a reload)
+    session_id = st.session_state.get("session_id")
+    if session_id and st.session_state.get("_loaded_history_sid") != session_id:
+        st.session_state.history = db_logic.load_history_from_db(history_db, session_id)
+        st.session_state["_loaded_history_sid"] = session_id
 
     # 4. Construct Agent Wrapper
     agent = None
@@ -52,6 +52,7 @@ def main():
             system_prompt=st.session_state.get("system_prompt", {}),
             kb_type=st.session_state.get('kb_active_type', 'None'),
             kb_config=st.session_state.get('kb_confirmed_config', {}),
+            kb_config_key=st.session_state.get('kb_config_key'),
             session_id=st.session_state.get("session_id")
         )
 
@@ -6,7 +6,7 @@ def render():
     with st.expander("Features"):
         st.markdown("""
             1. *Quick navigation*: Click a link in the **Current Conversation** sidebar to jump directly to the corresponding chat.
-            2. *Mark important chats*: Use the checkbox next to each link to mark chats as important and include them in the context (multiple selections allowed).
+            2. *Mark important chats*: Select the numbered buttons above the links to mark chats as important and include them in the context (multiple selections allowed). Marked chats show a 📌.
             3. *Delete unwanted chats*: Select chats and click **Delete Selected Chat** at the top to remove them.
             """)
 
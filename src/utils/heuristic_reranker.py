@@ -1,18 +1,139 @@
 from typing import List, Optional, Type, Any
 import os
 import re
+import asyncio
+import hashlib
+import math
+import heapq
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 from dotenv import load_dotenv
 
 from agno.knowledge.document import Document
 from agno.knowledge.reranker.base import Reranker
 from agno.utils.log import logger
 from agno.models.ollama import Ollama
+from ollama import Client as OllamaClient
 from agno.models.message import Message
 from agno.models.deepseek import DeepSeek
 from agno.models.openai import OpenAIChat
 
 load_dotenv()
 
+# In-process LRU of LLM scores, shared by every reranker instance (the key carries the model
+# and prompt settings), so the same (query, chunk) pair is scored once across sessions.
+_SCORE_CACHE_MAX = 10000
+_score_cache = OrderedDict()
+_score_cache_lock = threading.Lock()
+
+# Tagged score anywhere in the reply, or a reply that is nothing but the number (model dropped the tags).
+# The bare form is anchored so numbers inside a reasoning text are never taken for the score.
+_SCORE_RE = re.compile(r"<score>\s*(?P<tagged>\d+(?:\.\d+)?)\s*</score>|^\s*(?P<bare>\d+(?:\.\d+)?)\s*$")
+# Message has no validators, only default factories, which model_construct still runs
+_new_message = Message.model_construct
+
+_WORD_RE = re.compile(r"\w+")
+_BLOCK_SCORE_RE = re.compile(r"<score id=\"?(\d+)\"?>\s*(\d+(?:\.\d+)?)\s*</score>")
+
+def _build_templates(reasoning: bool, few_shot: str):
+    """
+    Pointwise prompt: (system message, then the user message split around its two variable parts:
+    prefix, between query and chunk, suffix).
+    Task, rubric and examples go in the system message, byte-identical for every document, so
+    servers with prefix caching (Ollama, vLLM) prefill them once per model load.
+    """
+    # Construct a strict prompt to get a numerical score
+    if reasoning:
+        system = (
+            "###Task: Evaluate the relevance of the Document Chunk to the Query.\n\n"
+
+            "###Instructions:\n"
+            "1. Briefly analyze the relevance (1-2 sentences).\n"
+            "2. Assign a float score based on the rubric.\n"
+            "3. Enclose the score within <score> and </score> tags.\n"
+            "4. Example output format: ... reasoning ... <score>0.8</score>\n\n"
+
+            "###Scoring Rubric:\n"
+            "- 0.9-1.0 (Highly Relevant): The chunk contains the direct answer to the query.\n"
+            "- 0.7-0.89 (Relevant): The chunk contains supporting information or context relevant to the query.\n"
+            "- 0.4-0.59 (Somewhat Relevant): The chunk mentions the topic but does not answer the query.\n"
+            "- 0.0-0.39 (Irrelevant): The chunk is unrelated.\n\n"
+
+            f"Examples:\n{few_shot}\n\n"
+        )
+    else:
+        system = (
+            "###Task: Evaluate the relevance of the Document Chunk to the Query.\n"
+            "Output a single float number between 0.01 (completely irrelevant) and 1.00 (highly relevant).\n"
+            "Output ONLY the number within <score> and </score> tags, no explanation, no words.\n"
+            "Example output format: <score>0.8</score>"
+
+            "###Scoring Rubric:\n"
+            "- 0.9-1.0 (Highly Relevant): The chunk contains the direct answer to the query.\n"
+            "- 0.7-0.89 (Relevant): The chunk contains supporting information or context relevant to the query.\n"
+            "- 0.4-0.59 (Somewhat Relevant): The chunk mentions the topic but does not answer the query.\n"
+            "- 0.0-0.39 (Irrelevant): The chunk is unrelated.\n\n"
+        )
+    return system, "### Input:\nQuery: ", "\nDocument Chunk: ", "\n\n"
+
+def _build_block_system(few_shot: str) -> str:
+    """System message of the listwise prompt (one score per numbered chunk)."""
+    return (
+        "###Task: Evaluate the relevance of each numbered Document Chunk to the Query.\n"
+        "Score every chunk independently with a float between 0.01 (completely irrelevant) and 1.00 (highly relevant).\n"
+        "Output ONLY one line per chunk, no explanation, no words.\n"
+        "Example output format:\n<score id=1>0.8</score>\n<score id=2>0.35</score>\n\n"
+
+        "###Scoring Rubric:\n"
+        "- 0.9-1.0 (Highly Relevant): The chunk contains the direct answer to the query.\n"
+        "- 0.7-0.89 (Relevant): The chunk contains supporting information or context relevant to the query.\n"
+        "- 0.4-0.59 (Somewhat Relevant): The chunk mentions the topic but does not answer the query.\n"
+        "- 0.0-0.39 (Irrelevant): The chunk is unrelated.\n\n"
+
+        f"Examples:\n{few_shot}\n\n"
+    )
+
+def _score_cache_get(key) -> Optional[float]:
+    with _score_cache_lock:
+        score = _score_cache.get(key)
+        if score is not None:
+            _score_cache.move_to_end(key)
+        return score
+
+def _score_cache_put(key, score: float):
+    with _score_cache_lock:
+        _score_cache[key] = score
+        _score_cache.move_to_end(key)
+        if len(_score_cache) > _SCORE_CACHE_MAX:
+            _score_cache.popitem(last=False)
+
+class _ScoredDocs:
+    """
+    Documents kept by a rerank call. With top_n set only the best top_n are held, in a bounded
+    min-heap, so memory stays O(top_n) and no final sort of every document is needed.
+    """
+    def __init__(self, top_n: Optional[int]):
+        self.top_n = top_n
+        # Documents kept so far, including those pushed out of the heap (for collected_number)
+        self.count = 0
+        self._heap = []
+
+    def add(self, doc: Document):
+        self.count += 1
+        # -count breaks score ties in favour of earlier documents and keeps Documents out of comparisons
+        item = (doc.reranking_score, -self.count, doc)
+        if self.top_n is None or len(self._heap) < self.top_n:
+            heapq.heappush(self._heap, item)
+        else:
+            heapq.heappushpop(self._heap, item)
+
+    def ranked(self) -> List[Document]:
+        # Sort documents by score in descending order (retrieval order on ties)
+        return [doc for _, _, doc in sorted(self._heap, reverse=True)]
+
 class HeuristicReranker(Reranker):
     """
     Base class for Rerankers that use an LLM to score relevance.
@@ -25,6 +146,20 @@ class HeuristicReranker(Reranker):
     collected_number: Optional[int] = None
     reasoning: bool = False
     add_few_shot: bool = False
+    # Documents scored concurrently; 1 keeps the sequential loop
+    max_workers: int = 1
+    # Documents scored together in one listwise prompt; 1 keeps one LLM call per document
+    batch_size: int = 1
+    # Reuse scores of already seen (query, chunk) pairs instead of asking the LLM again
+    cache_scores: bool = True
+    # Chunk characters sent to the LLM (None = whole chunk); early content dominates relevance
+    max_doc_chars: Optional[int] = 1500
+    # Generation cap per scored document (None = model default). Keep it generous for reasoning
+    # or thinking models (e.g. qwen3), whose output comes before the score
+    max_output_tokens: Optional[int] = None
+    # Chunks containing less than this fraction of the query's words score 0.0 without an LLM call
+    # (None = off). Hybrid search also returns purely semantic matches, so keep it low
+    cheap_prefilter: Optional[float] = None
     few_shot_examples: str = """
         ### Example 1
         Query: "What is the capital of France?"
@@ -51,8 +186,17 @@ class HeuristicReranker(Reranker):
         <score>0.35</score>
         """
     
+    # Fixed prompt parts: system messages and the fragments around the query and the chunk (built in __init__)
+    _system_prompt: str = ""
+    _block_system_prompt: str = ""
+    _prompt_prefix: str = ""
+    _prompt_mid: str = ""
+    _prompt_suffix: str = ""
+
     # Internal LLM instance (to be set by child classes)
     _llm: Optional[Any] = None
+    # Pooled keep-alive HTTP transport shared by every scoring call of this instance
+    _transport: Optional[Any] = None
 
     def __init__(self, **data):
         super().__init__(**data)
@@ -64,127 +208,356 @@ class HeuristicReranker(Reranker):
             raise ValueError(f"collected_number must be a positive integer, got {self.collected_number}")            
         if self.score_threshold is not None and not (0.0 <= self.score_threshold <= 1.0):
             raise ValueError(f"score_threshold must be between 0.0 and 1.0, got {self.score_threshold}")
+        if self.max_workers < 1:
+            raise ValueError(f"max_workers must be a positive integer, got {self.max_workers}")
+        if self.max_doc_chars is not None and self.max_doc_chars < 1:
+            raise ValueError(f"max_doc_chars must be a positive integer, got {self.max_doc_chars}")
+        if self.max_output_tokens is not None and self.max_output_tokens < 1:
+            raise ValueError(f"max_output_tokens must be a positive integer, got {self.max_output_tokens}")
+        if self.cheap_prefilter is not None and not (0.0 <= self.cheap_prefilter <= 1.0):
+            raise ValueError(f"cheap_prefilter must be between 0.0 and 1.0, got {self.cheap_prefilter}")
+        if self.batch_size < 1:
+            raise ValueError(f"batch_size must be a positive integer, got {self.batch_size}")
         if self.collected_number is not None and self.score_threshold is None:
             raise ValueError("score_threshold must be provided when collected_number is set.")
 
+        few_shot = self.few_shot_examples if self.add_few_shot else ""
+        self._system_prompt, self._prompt_prefix, self._prompt_mid, self._prompt_suffix = _build_templates(self.reasoning, few_shot)
+        self._block_system_prompt = _build_block_system(few_shot)
+
+    def _build_transport(self) -> httpx.HTTPTransport:
+        """Keep-alive pool sized for max_workers concurrent calls, retrying failed connects."""
+        self._transport = httpx.HTTPTransport(
+            retries=3,
+            limits=httpx.Limits(
+                max_keepalive_connections=max(self.max_workers, 10),
+                max_connections=max(self.max_workers * 2, 20),
+                keepalive_expiry=30.0,
+            ),
+        )
+        return self._transport
+
+    def _ready(self) -> bool:
+        return self._llm is not None
+
+    def _output_token_cap(self) -> Optional[int]:
+        """Generation cap per call; a listwise call emits one score line per document."""
+        if self.max_output_tokens is None:
+            return None
+        return self.max_output_tokens * self.batch_size
+
+    def close(self):
+        """Closes the pooled HTTP connections."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def _build_prompt(self, query: str, doc: Document) -> str:
+        # User message: only the query and the chunk change per call; the scaffolding is built once in __init__
+        return self._prompt_prefix + query + self._prompt_mid + self._snippet(doc) + self._prompt_suffix
+
+    def _snippet(self, doc: Document) -> str:
+        """The part of the chunk that is scored: at most max_doc_chars characters."""
+        if self.max_doc_chars is None or len(doc.content) <= self.max_doc_chars:
+            return doc.content
+        logger.debug(f"Truncating document '{doc.name}' from {len(doc.content)} to {self.max_doc_chars} chars for scoring")
+        return doc.content[:self.max_doc_chars]
+
+    def _parse_score(self, response) -> Optional[float]:
+        response_text = response.content if response and response.content else ""
+        
+        # Fast path: the first <score>...</score> holds a plain decimal
+        i = response_text.find("<score>")
+        if i != -1:
+            j = response_text.find("</score>", i + 7)
+            value = response_text[i + 7:j].strip() if j != -1 else ""
+            # isdigit keeps out what float() would also take: nan, inf, signs, exponents
+            if value.replace(".", "", 1).isdigit():
+                return max(0.0, min(1.0, float(value)))
+
+        # Extract the first tagged score, or the bare number the reply consists of
+        match = _SCORE_RE.search(response_text)
+        if match:
+            score = float(match.group("tagged") or match.group("bare"))
+            return max(0.0, min(1.0, score))
+        logger.warning(f"Could not parse score from model output: '{response_text}'. Defaulting to 0.0")
+        return None
+
+    def _build_block_prompt(self, query: str, block: List[Document]) -> str:
+        # Listwise variant: one prompt, one score per numbered chunk
+        chunks = "".join(f"[{i}] {self._snippet(doc)}\n\n" for i, doc in enumerate(block, start=1))
+        return (
+            f"Score every id from 1 to {len(block)}.\n\n"
+            "### Input:\n"
+            f"Query: {query}\n"
+            f"Document Chunks:\n{chunks}"
+        )
+
+    def _messages(self, system: str, prompt: str) -> List[Message]:
+        # Fresh list per call (the model appends its reply to it); the fields are plain strings,
+        # so pydantic validation is skipped
+        return [_new_message(role="system", content=system), _new_message(role="user", content=prompt)]
+
+    def _parse_block_scores(self, response, n: int) -> List[Optional[float]]:
+        response_text = response.content if response and response.content else ""
+        scores: List[Optional[float]] = [None] * n
+        for idx, value in _BLOCK_SCORE_RE.findall(response_text):
+            i = int(idx) - 1
+            if 0 <= i < n:
+                scores[i] = max(0.0, min(1.0, float(value)))
+        if None in scores:
+            logger.warning(f"Missing scores in listwise model output: '{response_text}'.")
+        return scores
+
+    def _cache_key(self, query: str, doc: Document):
+        digest = hashlib.blake2b(f"{query}\x00{doc.content}".encode(), digest_size=16).hexdigest()
+        # Everything that changes the score of a pair: scorer class and backend, prompt variant, chunk cut
+        backend = (getattr(self, "provider", None), getattr(self, "endpoint", None), getattr(self, "fallback_model", None))
+        return (type(self).__name__, *backend, self.model, self.reasoning, self.add_few_shot,
+                self.batch_size, self.max_doc_chars, digest)
+
+    def _request_scores(self, query: str, block: List[Document]) -> List[Optional[float]]:
+        """One LLM call: the pointwise prompt for a single document, the listwise one otherwise."""
+        if len(block) == 1:
+            response = self._llm.response(messages=self._messages(self._system_prompt, self._build_prompt(query, block[0])))
+            return [self._parse_score(response)]
+        response = self._llm.response(messages=self._messages(self._block_system_prompt, self._build_block_prompt(query, block)))
+        return self._parse_block_scores(response, len(block))
+
+    async def _arequest_scores(self, query: str, block: List[Document]) -> List[Optional[float]]:
+        """Async twin of _request_scores."""
+        if len(block) == 1:
+            response = await self._llm.aresponse(messages=self._messages(self._system_prompt, self._build_prompt(query, block[0])))
+            return [self._parse_score(response)]
+        response = await self._llm.aresponse(messages=self._messages(self._block_system_prompt, self._build_block_prompt(query, block)))
+        return self._parse_block_scores(response, len(block))
+
+    def _cached_scores(self, query: str, block: List[Document]):
+        """
+        Cache keys and the scores of a block known without an LLM call: cached scores, and 0.0 for
+        chunks rejected by cheap_prefilter (None where the LLM has to score the chunk).
+        """
+        keys, scores = None, [None] * len(block)
+        if self.cache_scores:
+            keys = [self._cache_key(query, doc) for doc in block]
+            scores = [_score_cache_get(k) for k in keys]
+        if self.cheap_prefilter is not None:
+            query_words = set(_WORD_RE.findall(query.lower()))
+            for i, doc in enumerate(block):
+                if scores[i] is None and query_words:
+                    overlap = len(query_words & set(_WORD_RE.findall(doc.content.lower()))) / len(query_words)
+                    if overlap < self.cheap_prefilter:
+                        scores[i] = 0.0
+        return keys, scores
+
+    def _store_scores(self, keys, scores: List[Optional[float]], misses: List[int], fresh: List[Optional[float]]):
+        for i, score in zip(misses, fresh):
+            scores[i] = score
+            # Unparsable replies are not cached, so the next query gets another try
+            if keys is not None and score is not None:
+                _score_cache_put(keys[i], score)
+
+    def _score_block(self, query: str, block: List[Document]) -> List[Optional[float]]:
+        """
+        Scores of a block of documents, None where the reply had no parsable score; errors score 0.0.
+        Only pairs missing from the score cache are sent to the LLM.
+        Safe to run from worker threads: it does not touch the documents.
+        """
+        keys, scores = self._cached_scores(query, block)
+        misses = [i for i, score in enumerate(scores) if score is None]
+        if not misses:
+            return scores
+        try:
+            fresh = self._request_scores(query, [block[i] for i in misses])
+        except Exception as e:
+            logger.error(f"Error scoring document: {e}")
+            fresh, keys = [0.0] * len(misses), None
+        self._store_scores(keys, scores, misses, fresh)
+        return scores
+
+    async def _score_block_async(self, query: str, block: List[Document]) -> List[Optional[float]]:
+        """Async twin of _score_block, for arerank."""
+        keys, scores = self._cached_scores(query, block)
+        misses = [i for i, score in enumerate(scores) if score is None]
+        if not misses:
+            return scores
+        try:
+            fresh = await self._arequest_scores(query, [block[i] for i in misses])
+        except Exception as e:
+            logger.error(f"Error scoring document: {e}")
+            fresh, keys = [0.0] * len(misses), None
+        self._store_scores(keys, scores, misses, fresh)
+        return scores
+
+    def _collect_block(self, block: List[Document], scores: List[Optional[float]], scored_docs: "_ScoredDocs") -> bool:
+        for doc, score in zip(block, scores):
+            if self._collect(doc, score, scored_docs):
+                return True
+        return False
+
+    def _collect(self, doc: Document, score: Optional[float], scored_docs: "_ScoredDocs") -> bool:
+        """
+        Applies a document's score: sets it, keeps the document if it passes score_threshold.
+        Returns True once collected_number documents have been kept.
+        """
+        if score is None:
+            # Unparsable output: drop it under a positive threshold, otherwise keep it at 0.0
+            if self.score_threshold is not None and self.score_threshold > 0:
+                return False
+            score = 0.0
+        doc.reranking_score = score
+
+        # Filter doc by score threshold if it is set
+        if self.score_threshold is None:
+            scored_docs.add(doc)
+            return False
+        if doc.reranking_score >= self.score_threshold:
+            scored_docs.add(doc)
+        # Checking for number of collected docs
+        if self.collected_number is not None and scored_docs.count >= self.collected_number:
+            logger.info(f"Collected {scored_docs.count} documents meeting threshold. Stopping reranking.")
+            return True
+        return False
+
     def rerank(self, query: str, documents: List[Document]) -> List[Document]:
         """
         Core reranking logic shared by all implementations.
+        Documents are scored in blocks of batch_size (one LLM call per block). With max_workers > 1
+        the blocks are scored concurrently (the LLM calls are I/O-bound); results are still applied
+        in retrieval order, so collected_number keeps its meaning.
         """
         if not documents:
             return []
         
-        if self._llm is None:
+        if not self._ready():
             logger.error("LLM client is not initialized.")
             return documents
 
         logger.info(f"Reranking {len(documents)} documents using {self.model}")
         
-        scored_docs = []
+        scored_docs = _ScoredDocs(self.top_n)
+        blocks = [documents[i:i + self.batch_size] for i in range(0, len(documents), self.batch_size)]
 
-        for doc in documents:
+        if self.max_workers > 1 and len(blocks) > 1:
+            # Sliding window of max_workers blocks: once collected_number is reached, blocks
+            # that were never submitted cost nothing and queued ones are cancelled
+            workers = min(self.max_workers, len(blocks))
+            ex = ThreadPoolExecutor(max_workers=workers)
             try:
-                # Construct a strict prompt to get a numerical score
-                if self.reasoning:
-                    prompt = (
-                        "###Task: Evaluate the relevance of the Document Chunk to the Query.\n\n"
-
-                        "###Instructions:\n"
-                        "1. Briefly analyze the relevance (1-2 sentences).\n"
-                        "2. Assign a float score based on the rubric.\n"
-                        "3. Enclose the score within <score> and </score> tags.\n"
-                        "4. Example output format: ... reasoning ... <score>0.8</score>\n\n"
-
-                        "###Scoring Rubric:\n"
-                        "- 0.9-1.0 (Highly Relevant): The chunk contains the direct answer to the query.\n"
-                        "- 0.7-0.89 (Relevant): The chunk contains supporting information or context relevant to the query.\n"
-                        "- 0.4-0.59 (Somewhat Relevant): The chunk mentions the topic but does not answer the query.\n"
-                        "- 0.0-0.39 (Irrelevant): The chunk is unrelated.\n\n"
-
-                        f"Examples:\n{self.few_shot_examples if self.add_few_shot else ""}\n\n"
-
-                        "### Input:\n"
-                        f"Query: {query}\n"
-                        f"Document Chunk: {doc.content}\n\n"
-                    )
-                else:
-                    prompt = (
-                        "###Task: Evaluate the relevance of the Document Chunk to the Query.\n"
-                        "Output a single float number between 0.01 (completely irrelevant) and 1.00 (highly relevant).\n"
-                        "Output ONLY the number within <score> and </score> tags, no explanation, no words.\n"
-                        "Example output format: <score>0.8</score>"
-
-                        "###Scoring Rubric:\n"
-                        "- 0.9-1.0 (Highly Relevant): The chunk contains the direct answer to the query.\n"
-                        "- 0.7-0.89 (Relevant): The chunk contains supporting information or context relevant to the query.\n"
-                        "- 0.4-0.59 (Somewhat Relevant): The chunk mentions the topic but does not answer the query.\n"
-                        "- 0.0-0.39 (Irrelevant): The chunk is unrelated.\n\n"
-
-                        "### Input:\n"
-                        f"Query: {query}\n"
-                        f"Document Chunk: {doc.content}\n\n"
-                    )
-
-                # Use the pre-initialized client (self._llm)
-                response = self._llm.response(messages=[Message(role="user", content=prompt)])
-                response_text = response.content if response and response.content else ""
-                
-                # Extract the first floating point number found in the response
-                match = re.search(r"<score>\s*(\d+(\.\d+)?)\s*</score>", response_text)
-                if match:
-                    score = float(match.group(1))
-                    score = max(0.0, min(1.0, score))                    
-                    doc.reranking_score = score
-                    
-                    # Filter doc by score threshold if it is set
-                    if self.score_threshold is not None:
-                        if doc.reranking_score >= self.score_threshold:
-                            scored_docs.append(doc)
-                        # Checking for number of collected docs
-                        if self.collected_number is not None:
-                                if len(scored_docs) >= self.collected_number:
-                                    logger.info(f"Collected {len(scored_docs)} documents meeting threshold. Stopping reranking.")
-                                    break
-                    else:
-                        scored_docs.append(doc)
-                else:
-                    logger.warning(f"Could not parse score from model output: '{response_text}'. Defaulting to 0.0")
-                    if self.score_threshold is not None and self.score_threshold > 0:
-                        continue
-                    doc.reranking_score = 0.0
-                    scored_docs.append(doc)
+                remaining = iter(blocks)
+                pending = deque((b, ex.submit(self._score_block, query, b)) for b in islice(remaining, workers))
+                while pending:
+                    block, future = pending.popleft()
+                    if self._collect_block(block, future.result(), scored_docs):
+                        break
+                    nxt = next(remaining, None)
+                    if nxt is not None:
+                        pending.append((nxt, ex.submit(self._score_block, query, nxt)))
+            finally:
+                # Don't wait for in-flight calls whose scores are no longer needed
+                ex.shutdown(wait=False, cancel_futures=True)
+        else:
+            for block in blocks:
+                if self._collect_block(block, self._score_block(query, block), scored_docs):
+                    break
 
-            except Exception as e:
-                logger.error(f"Error scoring document: {e}")
-                doc.reranking_score = 0.0
-                scored_docs.append(doc)
+        return scored_docs.ranked()
 
-        # Sort documents by score in descending order
-        scored_docs.sort(key=lambda x: x.reranking_score if x.reranking_score is not None else 0.0, reverse=True)
+    async def arerank(self, query: str, documents: List[Document]) -> List[Document]:
+        """
+        Async reranking for callers already on an event loop: blocks are scored as concurrent
+        tasks, at most max_workers calls in flight, and the rest are cancelled once
+        collected_number is reached. Same filtering/sorting as rerank.
+        """
+        if not documents:
+            return []
 
-        # Return top N documents if limit is set
-        if self.top_n is not None:
-            return scored_docs[:self.top_n]
-        
-        return scored_docs
+        if not self._ready():
+            logger.error("LLM client is not initialized.")
+            return documents
+
+        logger.info(f"Reranking {len(documents)} documents using {self.model} (async)")
+
+        sem = asyncio.Semaphore(self.max_workers)
+
+        async def bounded(block: List[Document]) -> List[Optional[float]]:
+            async with sem:
+                return await self._score_block_async(query, block)
+
+        blocks = [documents[i:i + self.batch_size] for i in range(0, len(documents), self.batch_size)]
+        tasks = [asyncio.ensure_future(bounded(b)) for b in blocks]
+        scored_docs = _ScoredDocs(self.top_n)
+        try:
+            for block, task in zip(blocks, tasks):
+                if self._collect_block(block, await task, scored_docs):
+                    break
+        finally:
+            # Blocks still waiting on the semaphore never reach the LLM
+            for task in tasks:
+                task.cancel()
+
+        return scored_docs.ranked()
 
 
 class OllamaHeuristicReranker(HeuristicReranker):
     """
     Reranker implementation specifically for Ollama models.
+    Scoring is a short classification-like task, so small quantized models are enough and the
+    per-call cost scales with model size: qwen3:0.6b or qwen3:1.7b (q4_K_M tags) for CPU, larger
+    models only if their scores are noticeably better on your data. For a dedicated reranker
+    (bge-reranker-v2-m3, Qwen3-Reranker) use XEncoderHeuristicReranker: those models emit a
+    relevance logit, not the <score> text this prompt asks for.
+    Run the server with OLLAMA_KEEP_ALIVE=30m (or longer) so the model, and the cached prefill of
+    the shared system prompt, stay loaded between queries.
     """
-    model: str = "qwen3:latest"
+    model: str = "qwen3:0.6b"
     host: str = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+    # Seconds between background pings that keep the model loaded (None = rely on OLLAMA_KEEP_ALIVE)
+    keepalive_interval: Optional[float] = None
+
+    _stop: Optional[Any] = None
 
     def __init__(self, **data):
         super().__init__(**data)
-        # Initialize the Ollama client
-        self._llm = Ollama(id=self.model, host=self.host)
+        if self.keepalive_interval is not None and self.keepalive_interval <= 0:
+            raise ValueError(f"keepalive_interval must be positive, got {self.keepalive_interval}")
+        # Greedy decoding: scores are deterministic and short
+        options = {"temperature": 0.0}
+        if self._output_token_cap() is not None:
+            options["num_predict"] = self._output_token_cap()
+        # Initialize the Ollama client on a pooled transport, so every document reuses the same connections
+        self._llm = Ollama(id=self.model, host=self.host, options=options)
+        self._llm.client = OllamaClient(host=self.host, transport=self._build_transport())
+
+        if self.keepalive_interval is not None:
+            self._stop = threading.Event()
+            threading.Thread(target=self._keepalive_loop, name=f"rerank-keepalive-{self.model}", daemon=True).start()
+
+    def _keepalive_loop(self):
+        # An empty prompt only loads the model; keep_alive outlasts the interval so it never idles out
+        keep_alive = f"{int(self.keepalive_interval * 2)}s"
+        while not self._stop.is_set():
+            try:
+                self._llm.client.generate(model=self.model, prompt="", keep_alive=keep_alive)
+            except Exception as e:
+                logger.warning(f"Reranker keepalive ping failed: {e}")
+            self._stop.wait(self.keepalive_interval)
+
+    def shutdown(self):
+        """Stops the keepalive thread and closes the pooled connections."""
+        if self._stop is not None:
+            self._stop.set()
+        self.close()
+
+# Model class per APIHeuristicReranker provider
+_PROVIDERS = {"deepseek": DeepSeek, "openai": OpenAIChat}
 
 class APIHeuristicReranker(HeuristicReranker):
     """
     Reranker imprelemtation for API models.
     Current available: Deepseek/openAI
+    Use a chat model (deepseek-chat, gpt-4o-mini): deepseek-reasoner spends its tokens reasoning
+    before a score the rubric already pins down.
     """
     provider: str = "deepseek"
     model: str = 'deepseek-chat'
@@ -192,8 +565,129 @@ class APIHeuristicReranker(HeuristicReranker):
 
     def __init__(self, **data):
         super().__init__(**data)
-        # Initialize the API client
-        if self.provider == 'deepseek':
-            self._llm = DeepSeek(id=self.model, api_key=self.api_key)
-        if self.provider == 'openai':
-            self._llm = OpenAIChat(id=self.model, api_key=self.api_key)
+        model_cls = _PROVIDERS.get(self.provider)
+        if model_cls is None:
+            raise ValueError(f"Unknown provider '{self.provider}', expected one of {sorted(_PROVIDERS)}")
+        # Initialize the API client on a pooled transport, so every document reuses the same connections
+        http_client = httpx.Client(transport=self._build_transport())
+        # Greedy decoding: scores are deterministic and short
+        decoding = {"temperature": 0.0, "max_tokens": self._output_token_cap()}
+        self._llm = model_cls(id=self.model, api_key=self.api_key, http_client=http_client, **decoding)
+
+class XEncoderHeuristicReranker(HeuristicReranker):
+    """
+    Reranker backed by a cross-encoder rerank endpoint (TEI, llama.cpp server with --reranking,
+    Jina/Cohere-compatible APIs): each block of batch_size documents is scored with one POST.
+    Logits (TEI with raw_scores) are squashed to 0..1 with a sigmoid; relevance scores that
+    are already normalized (llama.cpp, Jina/Cohere) are used as-is. Documents scoring below
+    use_llm_fallback_below are rescored by the LLM when fallback_model is set.
+
+    A block is split into length_buckets requests of similar-length chunks: servers that pack
+    concurrent requests pad every input to the longest one, so mixing short and long chunks
+    inflates queue time. Keep the server from packing requests as well, e.g. for TEI:
+        text-embeddings-router --model-id BAAI/bge-reranker-v2-m3 \\
+            --max-batch-requests 1 --max-client-batch-size 80 --max-batch-tokens 20480
+    """
+    model: str = "BAAI/bge-reranker-v2-m3"
+    endpoint: str = os.getenv("RERANK_ENDPOINT", "http://localhost:8001/rerank")
+    batch_size: int = 64
+    # Optional Ollama model that rescores low-confidence documents
+    fallback_model: Optional[str] = None
+    host: str = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+    use_llm_fallback_below: float = 0.5
+    # Requests per block, grouped by chunk length (1 = the whole block in one request)
+    length_buckets: int = 3
+    # Whether the endpoint returns logits; None = infer from the response: TEI's "score" entries
+    # (requested with raw_scores) or any value outside 0..1 are logits, "relevance_score" is not
+    scores_are_logits: Optional[bool] = None
+
+    _http: Optional[Any] = None
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        if not (0.0 <= self.use_llm_fallback_below <= 1.0):
+            raise ValueError(f"use_llm_fallback_below must be between 0.0 and 1.0, got {self.use_llm_fallback_below}")
+        if self.length_buckets < 1:
+            raise ValueError(f"length_buckets must be a positive integer, got {self.length_buckets}")
+        self._http = httpx.Client(transport=self._build_transport(), timeout=30.0)
+        if self.fallback_model:
+            self._llm = Ollama(id=self.fallback_model, host=self.host, options={"temperature": 0.0})
+            self._llm.client = OllamaClient(host=self.host, transport=self._transport)
+
+    def _ready(self) -> bool:
+        return self._http is not None
+
+    def _payload(self, query: str, block: List[Document]) -> dict:
+        texts = [self._snippet(doc) for doc in block]
+        # "texts"/"raw_scores" for TEI, "documents"/"model" for llama.cpp and Jina/Cohere-style APIs
+        return {"model": self.model, "query": query, "documents": texts, "texts": texts, "raw_scores": True}
+
+    def _parse_rerank_response(self, data, n: int) -> List[Optional[float]]:
+        # TEI returns a list, llama.cpp/Jina/Cohere wrap it in "results"; order is by score, not input
+        results = data.get("results", []) if isinstance(data, dict) else data
+        raw_scores = {}
+        for item in results:
+            raw = item.get("relevance_score", item.get("score"))
+            i = item.get("index")
+            if raw is not None and i is not None and 0 <= i < n:
+                raw_scores[i] = float(raw)
+
+        logits = self.scores_are_logits
+        if logits is None:
+            logits = (
+                any("relevance_score" not in item and "score" in item for item in results)
+                or any(not (0.0 <= v <= 1.0) for v in raw_scores.values())
+            )
+        scores: List[Optional[float]] = [None] * n
+        for i, raw in raw_scores.items():
+            # Clamped so extreme logits don't overflow exp()
+            scores[i] = 1.0 / (1.0 + math.exp(-max(-50.0, min(50.0, raw)))) if logits else raw
+        if None in scores:
+            logger.warning(f"Missing scores in rerank endpoint response: '{data}'.")
+        return scores
+
+    def _length_buckets(self, block: List[Document]) -> List[List[int]]:
+        """Indices of the block split into up to length_buckets groups of similar chunk length."""
+        order = sorted(range(len(block)), key=lambda i: len(block[i].content))
+        size = -(-len(order) // min(self.length_buckets, len(order)))
+        return [order[j:j + size] for j in range(0, len(order), size)]
+
+    def _low_confidence(self, scores: List[Optional[float]]) -> List[int]:
+        if self._llm is None:
+            return []
+        return [i for i, score in enumerate(scores) if score is None or score < self.use_llm_fallback_below]
+
+    def _request_scores(self, query: str, block: List[Document]) -> List[Optional[float]]:
+        scores: List[Optional[float]] = [None] * len(block)
+        for bucket in self._length_buckets(block):
+            response = self._http.post(self.endpoint, json=self._payload(query, [block[i] for i in bucket]))
+            response.raise_for_status()
+            for i, score in zip(bucket, self._parse_rerank_response(response.json(), len(bucket))):
+                scores[i] = score
+        low = self._low_confidence(scores)
+        if low:
+            for i, score in zip(low, super()._request_scores(query, [block[i] for i in low])):
+                scores[i] = score
+        return scores
+
+    async def _arequest_scores(self, query: str, block: List[Document]) -> List[Optional[float]]:
+        # Per-call client: an AsyncClient can't be shared across the event loops arerank may run on
+        scores: List[Optional[float]] = [None] * len(block)
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            for bucket in self._length_buckets(block):
+                response = await client.post(self.endpoint, json=self._payload(query, [block[i] for i in bucket]))
+                response.raise_for_status()
+                for i, score in zip(bucket, self._parse_rerank_response(response.json(), len(bucket))):
+                    scores[i] = score
+        low = self._low_confidence(scores)
+        if low:
+            for i, score in zip(low, await super()._arequest_scores(query, [block[i] for i in low])):
+                scores[i] = score
+        return scores
+
+    def close(self):
+        """Closes the pooled HTTP connections."""
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+        super().close()
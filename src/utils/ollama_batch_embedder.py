@@ -0,0 +1,66 @@
+from typing import List, Optional, Tuple, Dict, Any
+import asyncio
+
+from agno.knowledge.embedder.ollama import OllamaEmbedder
+from ollama import AsyncClient as AsyncOllamaClient
+from agno.utils.log import logger
+
+
+class BatchOllamaEmbedder(OllamaEmbedder):
+    """
+    OllamaEmbedder that embeds chunks in batches.
+    Ollama's /api/embed accepts a list of inputs, so the async insert path (used by
+    Knowledge.add_contents) sends one request per `batch_size` chunks instead of one per chunk.
+    """
+
+    def __post_init__(self):
+        # The parent turns batching off; Ollama's embed endpoint does support it
+        super().__post_init__()
+        self.enable_batch = True
+        self._aclient_loop = None
+
+    @property
+    def aclient(self):
+        # The embedder is shared across knowledge bases, but Knowledge.add_contents runs every ingest
+        # in a new asyncio.run loop: an httpx AsyncClient used on a closed loop fails, so the async
+        # client is rebuilt whenever the running loop changes (the sync client stays shared)
+        loop = asyncio.get_running_loop()
+        if self._aclient_loop is not loop:
+            self.async_client = None
+            self._aclient_loop = loop
+        return super().aclient
+
+    async def async_get_embeddings_batch_and_usage(
+        self, texts: List[str]
+    ) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        kwargs: Dict[str, Any] = {}
+        if self.options is not None:
+            kwargs["options"] = self.options
+        if self.dimensions is not None:
+            kwargs["dimensions"] = self.dimensions
+
+        # Own client for this ingest, on the running loop, closed when it is done
+        client_params: Dict[str, Any] = {k: v for k, v in {"host": self.host, "timeout": self.timeout}.items() if v is not None}
+        if self.client_kwargs:
+            client_params.update(self.client_kwargs)
+        aclient = AsyncOllamaClient(**client_params)
+
+        embeddings: List[List[float]] = []
+        try:
+            for i in range(0, len(texts), self.batch_size):
+                batch = texts[i : i + self.batch_size]
+                response = await aclient.embed(input=batch, model=self.id, **kwargs)
+                batch_embeddings = response["embeddings"] if response and "embeddings" in response else []
+                if len(batch_embeddings) != len(batch):
+                    # Let the vector db fall back to per-chunk embedding
+                    raise ValueError(f"Expected {len(batch)} embeddings from Ollama, got {len(batch_embeddings)}")
+
+                for embedding in batch_embeddings:
+                    if len(embedding) != self.dimensions:
+                        logger.warning(f"Expected embedding dimension {self.dimensions}, but got {len(embedding)}")
+                        embedding = []
+                    embeddings.append(embedding)
+        finally:
+            await aclient._client.aclose()
+
+        return embeddings, [None] * len(embeddings)
@@ -0,0 +1,59 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("agno")
+
+from src.utils.ollama_batch_embedder import BatchOllamaEmbedder
+
+
+class _EmbedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so a client reused across event loops would hit a stale connection
+    inputs = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        type(self).inputs.append(body["input"])
+        payload = json.dumps({"model": body["model"], "embeddings": [[0.1, 0.2, 0.3] for _ in texts]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ollama_host():
+    _EmbedHandler.inputs = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EmbedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_batch_path_survives_consecutive_ingests(ollama_host):
+    # Knowledge.add_contents runs each ingest in its own asyncio.run loop
+    embedder = BatchOllamaEmbedder(id="embeddinggemma:latest", dimensions=3, host=ollama_host, batch_size=2)
+    texts = ["a", "b", "c"]
+
+    for _ in range(3):
+        embeddings, usage = asyncio.run(embedder.async_get_embeddings_batch_and_usage(texts))
+        assert embeddings == [[0.1, 0.2, 0.3]] * 3
+        assert usage == [None] * 3
+
+    # Every ingest went through the batched endpoint: two requests of at most batch_size inputs each
+    assert _EmbedHandler.inputs == [["a", "b"], ["c"]] * 3
+
+
+def test_single_embedding_path_survives_consecutive_loops(ollama_host):
+    embedder = BatchOllamaEmbedder(id="embeddinggemma:latest", dimensions=3, host=ollama_host)
+
+    for _ in range(2):
+        assert asyncio.run(embedder.async_get_embedding("a")) == [0.1, 0.2, 0.3]